@@ -0,0 +1,111 @@
+import os
+from typing import Callable, List, Optional, Tuple
+
+from file_io import open_file, reserve_file
+from pdf_pages import count_pdf_pages, PdfPageCountError
+from video_probes import probe_duration, VideoProbeError
+from zip_probes import count_slides, estimate_epub_pages, ZipProbeError
+
+# what every type of file adds to the study time: pages (or slides) to read at the seconds per page of the user,
+# or milliseconds to watch or listen to at the speed of the user
+READ = "read"
+PLAY = "play"
+
+
+class Analyzer:
+    # a type of file that is analysed: the extensions it is found by, the probe that reads its value from the few
+    # bytes that hold it (returns (value, bytes read), raises one of probe_errors), the fallback that parses the
+    # whole file when the probe fails (returns the value, optional), the rough seconds it takes to analyse a file
+    # (cost_per_file plus cost_per_mb for every MB of it, see estimate_cost()) and the fields of the result of
+    # get_result it fills: the sum of the values, whether some file failed and the number of files;
+    # analyzers are sent to the worker processes with the files, so probe and fallback must be module level functions
+    def __init__(self, file_type: str, extensions: List[str], probe: Callable, probe_errors: Tuple[type, ...],
+                 fallback: Optional[Callable], study: str, value_field: str, error_field: str, count_field: str,
+                 cost_per_file: float, cost_per_mb: float):
+        self.file_type = file_type
+        self.extensions = [ext.lower() for ext in extensions]
+        self.probe = probe
+        self.probe_errors = probe_errors
+        self.fallback = fallback
+        self.study = study
+        self.value_field = value_field
+        self.error_field = error_field
+        self.count_field = count_field
+        self.cost_per_file = cost_per_file
+        self.cost_per_mb = cost_per_mb
+
+    @property
+    def empty_value(self):
+        # what a file that could not be parsed adds
+        return 0 if self.study == READ else 0.
+
+    def estimate_cost(self, size: int) -> float:
+        # seconds it should take to analyse a file of size bytes, before any file was timed
+        return self.cost_per_file + self.cost_per_mb * size / 1e6
+
+
+# file type -> analyzer, in the order of the fields of the result
+_analyzers = {}
+# map every lowercase extension to the type of file it identifies, so that each entry is classified once
+_extensions = {}
+
+
+def register_analyzer(analyzer: Analyzer):
+    # add a type of file to analyse, or replace the one with the same file type
+    for ext in analyzer.extensions:
+        if _extensions.get(ext, analyzer.file_type) != analyzer.file_type:
+            raise ValueError(f"{ext} files are already analysed as {_extensions[ext]}")
+    previous = _analyzers.pop(analyzer.file_type, None)
+    if previous is not None:
+        for ext in previous.extensions:
+            del _extensions[ext]
+    _analyzers[analyzer.file_type] = analyzer
+    for ext in analyzer.extensions:
+        _extensions[ext] = analyzer.file_type
+
+
+def get_analyzer(file_type: str) -> Analyzer:
+    return _analyzers[file_type]
+
+
+def get_analyzers() -> List[Analyzer]:
+    return list(_analyzers.values())
+
+
+def get_file_type(path: str) -> Optional[str]:
+    return _extensions.get(os.path.splitext(path)[1].lower())
+
+
+def get_signature() -> str:
+    # every extension analysed and its type of file, which files a complete walk of a tree found depends on it
+    return ";".join(f"{ext}={file_type}" for ext, file_type in sorted(_extensions.items()))
+
+
+def _pdf_pages_pypdf2(path: str) -> int:
+    # imported on first use, most PDFs never need it and it slows down the start of the app
+    from PyPDF2 import PdfFileReader
+    with open_file(path) as f:
+        return PdfFileReader(f, strict=False).getNumPages()
+
+
+def _duration_mediainfo(path: str) -> float:
+    # imported on first use, like PyPDF2 above
+    import mediainfo_session
+    # libmediainfo opens the file itself, it still counts against the budget of open files
+    with reserve_file():
+        return mediainfo_session.get_duration(path)
+
+
+# costs are rough priors measured on the benchmark corpora, with a slow disk in mind: probes read a few KB
+# wherever the file is, zip probes also read the central directory, which grows with the size of the archive
+register_analyzer(Analyzer("doc", [".pdf"], count_pdf_pages, (PdfPageCountError,), _pdf_pages_pypdf2, READ,
+                           'pdf_pages', 'pdf_error', 'pdf_documents', cost_per_file=0.002, cost_per_mb=0.0005))
+register_analyzer(Analyzer("vid", [".mp4", ".flv", ".mov", ".avi", ".mkv"], probe_duration, (VideoProbeError,),
+                           _duration_mediainfo, PLAY, 'video_seconds', 'video_error', 'videos',
+                           cost_per_file=0.003, cost_per_mb=0.00001))
+register_analyzer(Analyzer("epub", [".epub"], estimate_epub_pages, (ZipProbeError,), None, READ,
+                           'epub_pages', 'epub_error', 'epubs', cost_per_file=0.003, cost_per_mb=0.001))
+register_analyzer(Analyzer("slides", [".pptx", ".odp"], count_slides, (ZipProbeError,), None, READ,
+                           'slides', 'slides_error', 'slide_decks', cost_per_file=0.003, cost_per_mb=0.002))
+register_analyzer(Analyzer("audio", [".mp3", ".m4a"], probe_duration, (VideoProbeError,), _duration_mediainfo, PLAY,
+                           'audio_seconds', 'audio_error', 'audio_files', cost_per_file=0.002, cost_per_mb=0.00001))
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import AsyncIterator, List, Optional
+
+from backend import AnalysisCancelled, CancellationToken, iter_analysis
+from metrics import AnalysisMetrics
+
+# analyses of an AsyncAnalyser that walk their paths at the same time, the others wait for their turn
+MAX_CONCURRENT_ANALYSES = 4
+# seconds between the partial results of iter_analysis_async(), same as in the app
+PROGRESS_INTERVAL = 0.2
+
+
+class AsyncAnalyser:
+    # the analysis for an asyncio event loop: every analysis walks its paths (and waits for its files) in a thread of
+    # executor, the default executor of the loop if None, while the files of every analysis are parsed on the same
+    # bounded backend.worker_pool, which is never shared with executor so that waiting analyses cannot starve it;
+    # at most max_concurrent analyses run at once, or as many as semaphore allows if given;
+    # cancelling the task awaiting an analysis cancels the analysis, once the files being parsed are done
+    def __init__(self, executor: Optional[Executor] = None, max_concurrent: int = MAX_CONCURRENT_ANALYSES,
+                 semaphore: Optional[asyncio.Semaphore] = None):
+        self.executor = executor
+        self.max_concurrent = max_concurrent
+        self._semaphore = semaphore
+        self._loop = None  # the semaphore created here belongs to this loop
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        if self._semaphore is None or (self._loop is not None and self._loop is not loop):
+            # before Python 3.10 a semaphore only works in the loop it was created in
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._loop = loop
+        return self._semaphore
+
+    async def iter_analysis(self, paths: List[str], interval: float = PROGRESS_INTERVAL,
+                            metrics: Optional[AnalysisMetrics] = None) -> AsyncIterator[dict]:
+        # async version of backend.iter_analysis(): the running totals at most once every interval seconds,
+        # and last the dict with 'done' set to True and the 'result'; stopping early (with aclose(), or by
+        # cancelling the task iterating it) cancels the analysis
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore(loop):
+            token = CancellationToken()
+            queue = asyncio.Queue()
+
+            def analyse():
+                # in a thread of executor, every partial result goes through the queue of the loop
+                try:
+                    for progress in iter_analysis(paths, interval, token, metrics):
+                        loop.call_soon_threadsafe(queue.put_nowait, (progress, None))
+                except AnalysisCancelled:
+                    pass
+                except Exception as e:
+                    loop.call_soon_threadsafe(queue.put_nowait, (None, e))
+
+            future = loop.run_in_executor(self.executor, analyse)
+            try:
+                while True:
+                    progress, error = await queue.get()
+                    if error is not None:
+                        raise error
+                    yield progress
+                    if progress['done']:
+                        return
+            finally:
+                token.cancel()
+                # the thread stops at the next file, the semaphore must not be released before it does,
+                # however many times the task is cancelled in the meantime
+                cancelled = False
+                while not future.done():
+                    try:
+                        await asyncio.shield(future)
+                    except asyncio.CancelledError:
+                        cancelled = True
+                if cancelled:
+                    raise asyncio.CancelledError()
+
+    async def get_result(self, paths: List[str], metrics: Optional[AnalysisMetrics] = None) -> dict:
+        # async version of backend.get_result()
+        analysis = self.iter_analysis(paths, float('inf'), metrics)
+        try:
+            async for progress in analysis:
+                if progress['done']:
+                    return progress['result']
+        finally:
+            await analysis.aclose()
+
+
+# shared by every analysis of the functions below, so that they all wait on the same semaphore
+default_analyser = AsyncAnalyser()
+
+
+def iter_analysis_async(paths: List[str], interval: float = PROGRESS_INTERVAL,
+                        metrics: Optional[AnalysisMetrics] = None) -> AsyncIterator[dict]:
+    return default_analyser.iter_analysis(paths, interval, metrics)
+
+
+async def get_result_async(paths: List[str], metrics: Optional[AnalysisMetrics] = None) -> dict:
+    return await default_analyser.get_result(paths, metrics)
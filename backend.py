@@ -1,21 +1,61 @@
+import cProfile
+import os
+from functools import partial
+from math import ceil
 from pathlib import Path
-from typing import Tuple, List, Callable
-from threading import Thread
-from queue import Queue  # https://stackoverflow.com/a/36926134
-import json
-from json import JSONDecodeError
+from threading import Event, RLock, get_ident, local
+from time import time, perf_counter, strftime
+from typing import Tuple, List, Callable, Iterable, Iterator, Optional
 from enum import Enum
 
-from PyPDF2 import PdfFileReader
-from PyPDF2.utils import PdfReadError
-from pymediainfo import MediaInfo
+from analyzers import Analyzer, PLAY, READ, get_analyzer, get_analyzers, get_file_type, get_signature
+from cost_model import CostModel
+from file_index import FileIndex, TreeWalk, PAGE_SIZE
+from metrics import AnalysisMetrics, ParseStats, get_trace_file
+from preference_store import PreferenceStore
+from worker_pool import WorkerPool, Done, map_in_thread
 
 
 CURRENT_RELEASE = "2.2.4"
-video_exts = [".mp4", ".flv", ".mov", ".avi", ".mkv"]
-doc_exts = [".pdf"]
+video_exts = get_analyzer("vid").extensions
+doc_exts = get_analyzer("doc").extensions
 DB_PATH = Path.joinpath(Path.home(), '.study_planner')
 DB_FILE = str(Path.joinpath(DB_PATH, '_study_planner_db.json'))
+INDEX_FILE = str(Path.joinpath(DB_PATH, '_study_planner_index.sqlite3'))
+RELEASE_FILE = str(Path.joinpath(DB_PATH, '_study_planner_release.json'))
+PROFILES_PATH = Path.joinpath(DB_PATH, 'profiles')
+file_index = FileIndex(INDEX_FILE)
+preference_store = PreferenceStore(DB_FILE)  # call flush_preferences() before exiting
+worker_pool = WorkerPool()  # see worker_pool.configure() to resize it or to use processes
+cost_model = CostModel()  # learns how long files take to parse, so that the slowest are parsed first
+# held while the files collected by iter_analysis are updated, e.g. by the watcher and by a retry at the same time
+_files_lock = RLock()
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    # shared between an analysis and whoever started it, checked between files so that a cancelled analysis
+    # stops as soon as the files already being parsed are done
+    def __init__(self):
+        self._event = Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise AnalysisCancelled()
+
+    def wait(self, timeout: float) -> bool:
+        # sleep for timeout seconds or until cancelled, return whether it was cancelled
+        return self._event.wait(timeout)
 
 
 class Preference(Enum):
@@ -24,6 +64,8 @@ class Preference(Enum):
     vids_multiplier = 'vids_multiplier'
     day_hours = 'day_hours'
     dark_mode = 'dark_mode'
+    process_pool = 'process_pool'
+    watch_files = 'watch_files'
 
 
 class PreferenceDefault(Enum):
@@ -32,147 +74,498 @@ class PreferenceDefault(Enum):
     vids_multiplier = 1.
     day_hours = 5
     dark_mode = False
+    process_pool = False
+    watch_files = False
 
 
 def get_preference(preference: Preference, default_value: PreferenceDefault, valid_condition: Callable):
-    def write_default():
-        with open(DB_FILE, 'w') as f:
-            f.write(json.dumps({preference.value: default_value.value}))
-
-    Path.mkdir(DB_PATH, exist_ok=True)
-    if not Path(DB_FILE).exists():
-        write_default()
-    try:
-        data = json.load(open(DB_FILE, 'r'))
-    except JSONDecodeError:  # empty file
-        write_default()
-        return default_value.value
+    # the file is only read the first time, see PreferenceStore
+    data = preference_store.data
     if valid_condition(data):
         return data[preference.value]
     return default_value.value
 
 
 def set_preference(preference: str, default_value, new_value):
-    Path.mkdir(DB_PATH, exist_ok=True)
-    if not Path(DB_FILE).exists():
-        with open(DB_FILE, 'w') as f:
-            f.write(json.dumps({preference: default_value}))
-            return
-    with open(DB_FILE, 'r') as f:
-        data = json.load(f)
-        data[preference] = new_value
-    with open(DB_FILE, 'w') as f:
-        f.write(json.dumps(data))
+    # default_value is kept for compatibility, a missing preference is never written with it
+    preference_store.set(preference, new_value)
 
 
-def _is_video_file(path: str) -> bool:
-    return any([path.endswith(ext) for ext in video_exts])
+def flush_preferences():
+    # write the preferences changed in the last debounce seconds right away
+    preference_store.flush()
 
 
-def _is_doc_file(path: str) -> bool:
-    return any([path.endswith(ext) for ext in doc_exts])
+def is_analysed_file(path: str) -> bool:
+    # whether path is of a type of file that is analysed, see analyzers.py, judging from its name only
+    return get_file_type(path) is not None
 
 
-def _get_thread_doc_files(path: str) -> int:
-    tot = 0
-    if Path(path).is_file():
-        tot += 1
-    elif Path(path).is_dir():
-        for ext in doc_exts:
-            tot += len(list(Path(path).rglob(f"*{ext}")))  # TODO: make case-insensitive
-    return tot
+def scan_files(paths: List[str], token: Optional[CancellationToken] = None,
+               metrics: Optional[AnalysisMetrics] = None,
+               on_dir: Optional[Callable[[str, int], None]] = None) -> Iterator[Tuple[str, str]]:
+    # walk every path exactly once with os.scandir and yield (file path, file type) for each file of a type that is
+    # analysed,
+    # only keeping the directories left to visit in memory instead of the whole list of files;
+    # call on_dir, if given, with the absolute path and the mtime_ns of every directory walked, as it was before
+    # listing it, once the whole listing succeeded, or None if it could not be listed
+    for path in paths:
+        if os.path.isfile(path):
+            file_type = get_file_type(path)
+            if metrics is not None:
+                metrics.add_walked(1, 1 if file_type else 0)
+            if file_type:
+                yield path, file_type
+            continue
+        to_visit = [path]
+        while to_visit:
+            if token is not None:
+                token.raise_if_cancelled()
+            walked, classified = 0, 0
+            directory = to_visit.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns if on_dir is not None else None
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        walked += 1
+                        try:
+                            # do not follow symlinks to directories to avoid walking in circles
+                            if entry.is_dir(follow_symlinks=False):
+                                to_visit.append(entry.path)
+                            elif entry.is_file():
+                                file_type = get_file_type(entry.name)
+                                if file_type:
+                                    classified += 1
+                                    yield entry.path, file_type
+                        except OSError:
+                            continue
+                if on_dir is not None:
+                    on_dir(os.path.abspath(directory), mtime_ns)
+            except OSError as e:  # e.g. PermissionError, same as Path.rglob
+                print(e)
+                if on_dir is not None:
+                    on_dir(os.path.abspath(directory), None)
+            if metrics is not None:
+                metrics.add_walked(walked, classified)
+
+
+# what the parse function running in this worker read, and the class of the exception it failed with, see _parse_file
+_parse_stats = local()
+
+
+def _parse_with_analyzer(analyzer: Analyzer, path: str) -> Tuple[float, bool]:
+    try:
+        value, _parse_stats.bytes_read = analyzer.probe(path)
+        return value, False
+    except Exception as e:  # e.g. damaged, or the value is not where the probe looks
+        # an error the probe does not expect, e.g. a bug of it, fails only this file instead of the whole analysis
+        if analyzer.fallback is None or not isinstance(e, analyzer.probe_errors + (OSError,)):
+            print(e)
+            _parse_stats.error = type(e).__name__
+            return analyzer.empty_value, True
+        _parse_stats.fallback = True
+    try:
+        # e.g. PyPDF2 recovers damaged or encrypted PDFs, MediaInfo finds durations that are not in the header
+        return analyzer.fallback(path), False
+    except Exception as e:  # including PyPDF2.utils.PdfReadError
+        print(e)
+        _parse_stats.error = type(e).__name__
+        return analyzer.empty_value, True
 
 
-def _get_thread_vid_files(path: str) -> int:
-    tot = 0
-    if Path(path).is_file() and _is_video_file(path):
-        tot += 1
-    elif Path(path).is_dir():
-        for ext in video_exts:
-            tot += len(list(Path(path).rglob(f"*{ext}")))
-    return tot
+def _parse_pdf_pages(path: str) -> Tuple[int, bool]:
+    return _parse_with_analyzer(get_analyzer("doc"), path)
 
 
-def _get_thread_pdf_pages(path: str) -> Tuple[int, bool]:
-    pages, error = 0, False
-    try:
-        if Path(path).is_file() and _is_doc_file(path):
-            pages += PdfFileReader(open(path, 'rb'), strict=False).getNumPages()
-        elif Path(path).is_dir():
-            for ext in doc_exts:
-                for f in Path(path).rglob(f"*{ext}"):
-                    pages += PdfFileReader(open(f, 'rb'), strict=False).getNumPages()
-    except (PdfReadError, Exception) as e:
-        print(e)
-        error = True
-    return pages, error
+def _parse_video_milliseconds(path: str) -> Tuple[float, bool]:
+    return _parse_with_analyzer(get_analyzer("vid"), path)
+
+
+def _get_parsers() -> dict:
+    # parse functions for every file type, each returns (value, error) for a single file;
+    # built at every analysis so that analyzers registered in the meantime are included
+    return {analyzer.file_type: partial(_parse_with_analyzer, analyzer) for analyzer in get_analyzers()}
+
+
+def _new_result() -> dict:
+    # the sum of the values, whether some file failed and the number of files of every analyzer, see analyzers.py
+    result = {}
+    for analyzer in get_analyzers():
+        result[analyzer.value_field] = analyzer.empty_value
+        result[analyzer.error_field] = False
+        result[analyzer.count_field] = 0
+    result['failed_files'] = []  # see _failed_file, sorted by path
+    return result
 
 
-def _get_thread_video_seconds(path: str) -> Tuple[float, bool]:
-    seconds, error = 0., False
+def _final_result(result: dict) -> dict:
+    # a copy of the running result with played durations in seconds instead of milliseconds
+    final = dict(result)
+    for analyzer in get_analyzers():
+        if analyzer.study == PLAY:
+            final[analyzer.value_field] /= 1000
+    final['failed_files'] = sorted(result['failed_files'], key=lambda failed: failed['path'])
+    return final
+
+
+def _failed_file(path: str, file_type: str, error: str) -> dict:
+    # error is the class of the exception the file could not be parsed with, e.g. PdfReadError
+    return {'path': path, 'file_type': file_type, 'error': error}
+
+
+def _add_to_result(result: dict, path: str, file_type: str, value: float, error: Optional[str]):
+    analyzer = get_analyzer(file_type)
+    result[analyzer.value_field] += value
+    result[analyzer.error_field] |= error is not None
+    result[analyzer.count_field] += 1
+    if error is not None:
+        result['failed_files'].append(_failed_file(path, file_type, error))
+
+
+def _parse_file(item: Tuple[str, str, Tuple[str, int, int], Callable]) \
+        -> Tuple[str, str, Tuple, float, Optional[str], Optional[ParseStats]]:
+    # module level so that it can also run in a worker process;
+    # a file is never lost because of another one: every parse function returns (value, error) with error set to
+    # True if the file could not be parsed, and whatever else one raises fails only its file, see failed_files
+    path, file_type, key, parse = item
+    _parse_stats.bytes_read, _parse_stats.fallback, _parse_stats.error = 0, False, None
+    start = perf_counter()
     try:
-        if Path(path).is_file() and _is_video_file(path):
-            seconds += MediaInfo.parse(path).tracks[0].duration
-        elif Path(path).is_dir():
-            for ext in video_exts:
-                for f in Path(path).rglob(f"*{ext}"):
-                    seconds += MediaInfo.parse(f).tracks[0].duration
-    except (FileNotFoundError, IOError, RuntimeError, Exception) as e:
+        value, error = parse(path)
+    except AnalysisCancelled:
+        raise
+    except Exception as e:  # e.g. of a parse function given to run_multithreaded
         print(e)
-        error = True
-    return seconds, error
-
-
-def run_multithreaded(paths: List[str], callback: Callable, **kwargs):
-    total, error, return_tuple = 0., False, False
-    threads = []
-    queue = Queue()
-    if len(paths) == 1 and Path(paths[0]).is_dir():  # go one level deeper
-        _paths = list(Path(paths[0]).glob("*"))
-        if _paths:  # prevent crash for empty dirs
-            paths = [str(p) for p in _paths]
-    for path in paths:
-        threads.append(Thread(target=lambda q, func, p: q.put(func(p)), args=(queue, callback, path)))
-    for thread in threads:
-        thread.start()
-    for thread in threads:
-        thread.join()
-    for _ in range(len(threads)):
-        res = queue.get()  # this is blocking, like await
-        if isinstance(res, tuple):
-            total += res[0]
-            error |= res[1]
-            return_tuple = True
+        value, error, _parse_stats.error = get_analyzer(file_type).empty_value, True, type(e).__name__
+    stats = (path, start, perf_counter() - start, _parse_stats.bytes_read, _parse_stats.fallback,
+             os.getpid(), get_ident())
+    return path, file_type, key, value, (_parse_stats.error or "Error") if error else None, stats
+
+
+def _estimate_cost(item: Tuple[str, str, Tuple[str, int, int], Callable]) -> float:
+    # of an item yielded by _lookup_files, from the type of the file and the size in its key
+    _, file_type, key, _ = item
+    return cost_model.estimate(file_type, key[1])
+
+
+def _lookup_batch(batch: List[Tuple[str, str, Tuple[str, int, int]]], parsers: dict,
+                  metrics: Optional[AnalysisMetrics] = None) -> Iterator:
+    # one index query for the files of a directory (or for PAGE_SIZE of them) instead of one per file
+    known = file_index.lookup([key[0] for _, _, key in batch])
+    for path, file_type, key in batch:
+        row = known.get(key[0])
+        value = None
+        # files with errors are always parsed again, the error may have been temporary, and so are files
+        # indexed as another type, e.g. by an analyzer replaced since
+        if row is not None and row[0] == key[1] and row[1] == key[2] and row[2] == file_type and not row[4]:
+            value = row[3]
+        if metrics is not None:
+            if value is None:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        if value is None:
+            yield path, file_type, key, parsers[file_type]
         else:
-            total += res
+            yield Done((path, file_type, None, value, None, None))
+
+
+def _lookup_files(paths: List[str], parsers: dict, progress: Optional[dict] = None,
+                  token: Optional[CancellationToken] = None, metrics: Optional[AnalysisMetrics] = None,
+                  walk: Optional[TreeWalk] = None) -> Iterator:
+    # only files that changed since they were last parsed are sent to the workers, the others just need a stat call;
+    # index lookups happen here, in the calling thread, so that they also work with a process pool;
+    # fill walk, if given, with the directories walked and the files found, see FileIndex.update_tree()
+    file_index.touch(paths)
+    batch = []
+    for path, file_type in scan_files(paths, token, metrics, walk.add_dir if walk is not None else None):
+        if file_type not in parsers:
+            continue
+        if token is not None:
+            token.raise_if_cancelled()
+        if progress is not None:
+            progress['files_found'] += 1
+        try:
+            key = file_index.key(path)
+        except OSError as e:
+            print(e)
+            yield Done((path, file_type, None, 0, type(e).__name__, None))
+            continue
+        if walk is not None:
+            walk.add_file(key[0])
+        if batch and (len(batch) >= PAGE_SIZE or os.path.dirname(batch[-1][2][0]) != os.path.dirname(key[0])):
+            yield from _lookup_batch(batch, parsers, metrics)
+            batch = []
+        batch.append((path, file_type, key))
+    yield from _lookup_batch(batch, parsers, metrics)
+    if progress is not None:
+        progress['walk_done'] = True
+    if metrics is not None:
+        metrics.walk_done()
+
+
+def _analyse_files(paths: List[str], parsers: dict, progress: Optional[dict] = None,
+                   token: Optional[CancellationToken] = None, metrics: Optional[AnalysisMetrics] = None,
+                   in_thread: bool = False, walk: Optional[TreeWalk] = None) \
+        -> Iterator[Tuple[str, str, float, Optional[str]]]:
+    # yield (path, file type, value, error) of every file, error is None or the class of the exception
+    # the file could not be parsed with; the files that should take longest are parsed first
+    items = _lookup_files(paths, parsers, progress, token, metrics, walk)
+    if in_thread:
+        results = map_in_thread(_parse_file, items)
+    else:
+        results = worker_pool.map_unordered(_parse_file, items, cost=_estimate_cost)
+    try:
+        for path, file_type, key, value, error, stats in results:
+            if key is not None:
+                file_index.set(*key, file_type, value, error is not None)
+                if stats is not None:
+                    cost_model.observe(file_type, key[1], stats[2])
+            if metrics is not None and stats is not None:
+                metrics.add_parsed(file_type, stats)
+            if token is not None:
+                token.raise_if_cancelled()
+            yield path, file_type, value, error
+    finally:
+        # files queued but not started yet are dropped right away instead of when the generator is collected
+        results.close()
+
+
+def run_multithreaded(paths: List[str], callback: Callable, file_type: str,
+                      token: Optional[CancellationToken] = None):
+    # parse every file of the given type under paths with callback, one file at a time on the shared worker pool
+    total, error = 0., False
+    try:
+        for _, _, value, _error in _analyse_files(paths, {file_type: callback}, token=token):
+            total += value
+            error |= _error is not None
+    finally:  # keep what was parsed before a cancellation
+        file_index.save()
     if total == int(total):  # 1.0 == 1 but 1.2 != 1
         total = int(total)  # cast to int
-    return (total, error) if return_tuple else total
+    return total, error
 
 
 def get_total_files(paths: List[str], type: str) -> int:
-    if type == "doc":
-        return run_multithreaded(paths, _get_thread_doc_files)
-    elif type == "vid":
-        return run_multithreaded(paths, _get_thread_vid_files)
+    # counting does not need any parsing, so the walk alone is enough
+    return sum(1 for _, file_type in scan_files(paths) if file_type == type)
 
 
 def get_total_pdf_pages(paths: List[str]) -> Tuple[int, bool]:
-    return run_multithreaded(paths, _get_thread_pdf_pages)
+    return run_multithreaded(paths, _parse_pdf_pages, file_type="doc")
 
 
 def get_total_video_seconds(paths: List[str]) -> Tuple[float, bool]:
-    return run_multithreaded(paths, _get_thread_video_seconds)
+    return run_multithreaded(paths, _parse_video_milliseconds, file_type="vid")
 
 
-def get_result(paths: List[str]) -> dict:
-    pdf_pages, pdf_error = get_total_pdf_pages(paths)
-    video_seconds, video_error = get_total_video_seconds(paths)
+def _get_progress(progress: dict, result: dict, start: float, final: Optional[dict] = None) -> dict:
+    elapsed = time() - start
+    eta = None
+    # the remaining time can only be estimated once every file has been found
+    if progress['walk_done'] and progress['files_analysed']:
+        eta = elapsed / progress['files_analysed'] * (progress['files_found'] - progress['files_analysed'])
+    return {
+        'files_found': progress['files_found'],
+        'files_analysed': progress['files_analysed'],
+        # what there is to read and to watch or listen to so far, see get_study_material()
+        'pages': sum(result[analyzer.value_field] for analyzer in get_analyzers() if analyzer.study == READ),
+        'seconds': sum(result[analyzer.value_field] for analyzer in get_analyzers() if analyzer.study == PLAY) / 1000,
+        'errors': progress['errors'],
+        'elapsed': elapsed,
+        'eta': eta,
+        'done': final is not None,
+        'result': final,
+    }
+
+
+def _dump_profile(profiler: cProfile.Profile):
+    try:
+        Path.mkdir(PROFILES_PATH, parents=True, exist_ok=True)
+        profile_file = str(Path.joinpath(PROFILES_PATH, f"analysis_{strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.pstats"))
+        profiler.dump_stats(profile_file)
+        print(f"Profile of the analysis written to {profile_file}")
+    except OSError as e:
+        print(e)
+
+
+def _indexed_files(paths: List[str], progress: dict, metrics: Optional[AnalysisMetrics] = None) \
+        -> Iterator[Tuple[str, str, float, Optional[str]]]:
+    # same as _analyse_files, straight from the index once FileIndex.is_fresh(), so without errors since the rows of
+    # files with errors are never fresh
+    for path, (_, _, file_type, value, _) in file_index.iter_rows(paths):
+        progress['files_found'] += 1
+        if metrics is not None:
+            metrics.cache_hits += 1
+        yield path, file_type, value, None
+
+
+def iter_analysis(paths: List[str], interval: float = 0., token: Optional[CancellationToken] = None,
+                  metrics: Optional[AnalysisMetrics] = None, profile: bool = False,
+                  files: Optional[dict] = None) -> Iterator[dict]:
+    # yield the running totals of the analysis at most once every interval seconds, while files are being parsed;
+    # the last dict yielded has 'done' set to True and the same 'result' get_result returns;
+    # raise AnalysisCancelled once token is cancelled;
+    # fill metrics, if given, with where the time went, see also metrics.TRACE_ENV;
+    # with profile, run the whole analysis in this thread under cProfile and dump the stats in PROFILES_PATH;
+    # fill files, if given, with path -> (file type, value, error) of every file, see apply_changes();
+    # if nothing changed under paths since a complete analysis of them (or of a directory containing them),
+    # the result comes straight from the file index
+    paths = [os.path.abspath(path) for path in paths]
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:  # another analysis is already being profiled
+            print(e)
+            profiler = None
+    start, last = time(), 0.
+    progress = {'files_found': 0, 'files_analysed': 0, 'errors': 0, 'walk_done': False}
+    result = _new_result()
+    trace_file = get_trace_file()
+    if metrics is None and trace_file is not None:
+        metrics = AnalysisMetrics()
+    if metrics is not None:
+        metrics.start(1 if profiler is not None else worker_pool.max_workers, trace=trace_file is not None)
+    # the analyzers this analysis runs with, a tree indexed with others must be walked again
+    signature = get_signature()
+    walk = None
+    if file_index.is_fresh(paths, signature):
+        file_index.touch(paths)
+        analysed = _indexed_files(paths, progress, metrics)
+        progress['walk_done'] = True
+        if metrics is not None:
+            metrics.walk_done()
+    else:
+        walk = file_index.new_walk()
+        analysed = _analyse_files(paths, _get_parsers(), progress, token, metrics, in_thread=profiler is not None,
+                                  walk=walk)
+    try:
+        for path, file_type, value, error in analysed:
+            if files is not None:
+                files[path] = (file_type, value, error)
+            _add_to_result(result, path, file_type, value, error)
+            progress['files_analysed'] += 1
+            progress['errors'] += error is not None
+            if time() - last >= interval:
+                last = time()
+                yield _get_progress(progress, result, start)
+        if walk is not None:
+            # every file was found and parsed, from now on the index can answer for paths on its own
+            file_index.update_tree(paths, walk, signature)
+    finally:  # keep what was parsed before a cancellation
+        analysed.close()
+        file_index.save()
+        if walk is not None:
+            walk.close()
+        if metrics is not None:
+            metrics.finish()
+            if trace_file is not None:
+                try:
+                    metrics.write_trace(trace_file)
+                except OSError as e:
+                    print(e)
+        if profiler is not None:
+            profiler.disable()
+            _dump_profile(profiler)
+    yield _get_progress(progress, result, start, _final_result(result))
+
+
+def get_result(paths: List[str], token: Optional[CancellationToken] = None,
+               metrics: Optional[AnalysisMetrics] = None, profile: bool = False) -> dict:
+    # files of every type are parsed on the same pool while the tree is being walked
+    for progress in iter_analysis(paths, interval=float('inf'), token=token, metrics=metrics, profile=profile):
+        if progress['done']:
+            return progress['result']
+
+
+def get_result_from_files(files: dict) -> dict:
+    # same as get_result, from the files collected by iter_analysis
+    result = _new_result()
+    for path, (file_type, value, error) in files.items():
+        _add_to_result(result, path, file_type, value, error)
+    return _final_result(result)
+
+
+def apply_changes(files: dict, changed: Iterable[str], token: Optional[CancellationToken] = None) -> dict:
+    # update files, as collected by iter_analysis, with what is now at each of the changed paths
+    # (files or whole directories, added, modified or removed) and return the new result;
+    # only the files that were added or modified are parsed again
+    with _files_lock:
+        existing = []
+        for path in changed:
+            if files.pop(path, None) is None:
+                # a directory, forget everything that was under it
+                prefix = os.path.join(path, "")
+                for known in [known for known in files if known.startswith(prefix)]:
+                    del files[known]
+            if os.path.exists(path):
+                existing.append(path)
+        try:
+            for path, file_type, value, error in _analyse_files(existing, _get_parsers(), token=token):
+                files[path] = (file_type, value, error)
+        finally:
+            file_index.save()
+        return get_result_from_files(files)
+
+
+def retry_failed(result: dict, files: Optional[dict] = None, token: Optional[CancellationToken] = None) -> dict:
+    # parse again only the failed files of result, as returned by get_result, and return a copy of result with
+    # the values of those that can now be parsed added to the totals;
+    # with files, as collected by iter_analysis, retry their failed files instead and update them as well
+    if files is not None:
+        with _files_lock:
+            return apply_changes(files, [path for path, (_, _, error) in files.items() if error is not None], token)
+    merged = dict(result)
+    merged['failed_files'] = []
+    retried = set()
+    try:
+        for path, file_type, value, error in _analyse_files([failed['path'] for failed in result['failed_files']],
+                                                            _get_parsers(), token=token):
+            retried.add(path)
+            analyzer = get_analyzer(file_type)
+            if error is not None:
+                merged['failed_files'].append(_failed_file(path, file_type, error))
+            elif analyzer.study == PLAY:
+                merged[analyzer.value_field] += value / 1000
+            else:
+                merged[analyzer.value_field] += value
+    finally:
+        file_index.save()
+    # e.g. removed in the meantime
+    merged['failed_files'] += [failed for failed in result['failed_files'] if failed['path'] not in retried]
+    merged['failed_files'].sort(key=lambda failed: failed['path'])
+    failed_types = {failed['file_type'] for failed in merged['failed_files']}
+    for analyzer in get_analyzers():
+        if analyzer.error_field in merged:
+            merged[analyzer.error_field] = analyzer.file_type in failed_types
+    return merged
+
+
+def get_study_material(result: dict) -> dict:
+    # the pages (and slides) to read and the seconds of videos and recordings to watch or listen to in result,
+    # with the number of files and whether some could not be parsed, summed over the analyzers of each kind;
+    # fields missing from result, e.g. of analyzers registered after it was computed, count as nothing
+    material = {'pages': 0, 'documents': 0, 'documents_error': False,
+                'seconds': 0., 'recordings': 0, 'recordings_error': False}
+    for analyzer in get_analyzers():
+        kind = 'documents' if analyzer.study == READ else 'recordings'
+        material['pages' if analyzer.study == READ else 'seconds'] += result.get(analyzer.value_field, 0)
+        material[kind] += result.get(analyzer.count_field, 0)
+        material[f'{kind}_error'] |= result.get(analyzer.error_field, False)
+    return material
+
+
+def get_study_time(result: dict, docs_seconds: int, vids_multiplier: float, day_hours: int) -> dict:
+    # seconds needed to study the documents at docs_seconds per page and to watch the videos (and listen to the
+    # recordings) at vids_multiplier speed, and days needed to study everything at day_hours per day
+    material = get_study_material(result)
+    docs_time = docs_seconds * material['pages']
+    vids_time = material['seconds'] / vids_multiplier
     return {
-        'pdf_pages': pdf_pages,
-        'pdf_error': pdf_error,
-        'pdf_documents': get_total_files(paths, type="doc"),
-        'video_seconds': video_seconds / 1000,
-        'video_error': video_error,
-        'videos': get_total_files(paths, type="vid"),
+        'docs_time': docs_time,
+        'vids_time': vids_time,
+        'total_time': docs_time + vids_time,
+        'days': ceil((docs_time + vids_time) / 3600 / day_hours),
     }
@@ -0,0 +1,175 @@
+"""
+Run many analyses at once in one event loop with async_analysis.py, on the subtrees of a synthetic corpus (see
+corpus.py): check their results against the blocking get_result, that the threads stay bounded by the shared worker
+pool and the concurrency semaphore however many analyses are started, that partial results arrive while an analysis
+runs, how long a cancelled analysis takes to stop, and that analyses cancelled twice in a row still hold their turn
+until their threads stop.
+
+Usage: python benchmarks/bench_async.py [--files 20000] [--analyses 24] [--max-concurrent 4]
+Exits with 1 if a check fails.
+"""
+import asyncio
+import os
+import sys
+import threading
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import async_analysis  # noqa: E402
+import backend  # noqa: E402
+from async_analysis import AsyncAnalyser  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+from file_index import FileIndex  # noqa: E402
+
+# a cancelled analysis must stop within this many seconds
+CANCEL_BUDGET = 1.
+FAN_OUT = 6
+
+
+async def _sample_threads(peak: list, stop: asyncio.Event):
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.001)
+
+
+async def _concurrent(analyser: AsyncAnalyser, paths: list) -> tuple:
+    # results of every analysis, most threads alive at once and seconds taken
+    peak, stop = [threading.active_count()], asyncio.Event()
+    sampler = asyncio.ensure_future(_sample_threads(peak, stop))
+    start = perf_counter()
+    results = await asyncio.gather(*(analyser.get_result([path]) for path in paths))
+    seconds = perf_counter() - start
+    stop.set()
+    await sampler
+    return results, peak[0], seconds
+
+
+async def _partial_results(analyser: AsyncAnalyser, path: str) -> int:
+    partial = 0
+    async for progress in analyser.iter_analysis([path], interval=0.05):
+        partial += not progress['done']
+    return partial
+
+
+async def _cancel(analyser: AsyncAnalyser, path: str, after: float) -> float:
+    # seconds from the cancellation of the task to its end
+    task = asyncio.ensure_future(analyser.get_result([path]))
+    await asyncio.sleep(after)
+    start = perf_counter()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        return perf_counter() - start
+    raise RuntimeError("The analysis ended before it could be cancelled")
+
+
+async def _cancel_twice(analyser: AsyncAnalyser, path: str, after: float) -> int:
+    # the most analyses running at once in their threads, while the running ones are cancelled twice in a row
+    # and as many others wait for their turn
+    running, lock = [0, 0], threading.Lock()  # now, most at once
+    iter_analysis = async_analysis.iter_analysis
+
+    def counting_iter_analysis(*args, **kwargs):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        try:
+            yield from iter_analysis(*args, **kwargs)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    async_analysis.iter_analysis = counting_iter_analysis
+    try:
+        tasks = [asyncio.ensure_future(analyser.get_result([path])) for _ in range(2 * analyser.max_concurrent)]
+        await asyncio.sleep(after)
+        for task in tasks[:analyser.max_concurrent]:
+            task.cancel()
+        await asyncio.sleep(0)  # the cancelled tasks are now waiting for their threads to stop
+        for task in tasks[:analyser.max_concurrent]:
+            task.cancel()
+        await asyncio.sleep(after)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        async_analysis.iter_analysis = iter_analysis
+    return running[1]
+
+
+def _new_index(cache_dir: str, name: str):
+    # so that every file is parsed again
+    backend.file_index = FileIndex(os.path.join(cache_dir, f"{name}.sqlite3"))
+
+
+def run(files: int, analyses: int, max_concurrent: int, seed: int) -> list:
+    problems = []
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    analyser = AsyncAnalyser(max_concurrent=max_concurrent)
+    with TemporaryDirectory() as root, TemporaryDirectory() as cache_dir:
+        make_corpus(root, files, 3, FAN_OUT, seed)
+        # every subtree at depth 2, analysed over and over if there are more analyses than subtrees
+        subtrees = [os.path.join(root, f"dir{a}", f"dir{b}") for a in range(FAN_OUT) for b in range(FAN_OUT)]
+        paths = [subtrees[i % len(subtrees)] for i in range(analyses)]
+        _new_index(cache_dir, "blocking")
+        start = perf_counter()
+        expected = [backend.get_result([path]) for path in paths]
+        print(f"{analyses} blocking analyses one after the other: {perf_counter() - start:.3f} s")
+
+        # threads of the loop, of the pool and of the analyses, and the one of the sampler
+        threads_allowed = threading.active_count() + backend.worker_pool.max_workers + max_concurrent + 1
+        _new_index(cache_dir, "async")
+        results, peak_threads, seconds = loop.run_until_complete(_concurrent(analyser, paths))
+        print(f"{analyses} async analyses at once: {seconds:.3f} s, at most {peak_threads} threads alive "
+              f"(allowed: {threads_allowed})")
+        if results != expected:
+            problems.append("the async results are not the same as the blocking ones")
+        if peak_threads > threads_allowed:
+            problems.append(f"{peak_threads} threads were alive at once, over {threads_allowed}")
+
+        _new_index(cache_dir, "partial")
+        partial = loop.run_until_complete(_partial_results(analyser, root))
+        print(f"{partial} partial results before the final one")
+        if not partial:
+            problems.append("no partial results were yielded")
+
+        _new_index(cache_dir, "cancel")
+        cancel_seconds = loop.run_until_complete(_cancel(analyser, root, 0.05))
+        print(f"cancelled analysis stopped in {cancel_seconds:.3f} s")
+        if cancel_seconds > CANCEL_BUDGET:
+            problems.append(f"the cancelled analysis took {cancel_seconds:.3f} s to stop")
+
+        _new_index(cache_dir, "cancel_twice")
+        peak_running = loop.run_until_complete(_cancel_twice(analyser, root, 0.05))
+        print(f"at most {peak_running} analyses running at once while cancelled twice "
+              f"(allowed: {analyser.max_concurrent})")
+        if peak_running > analyser.max_concurrent:
+            problems.append(f"{peak_running} analyses ran at once after a double cancellation, "
+                            f"over {analyser.max_concurrent}")
+    loop.close()
+    return problems
+
+
+def main():
+    parser = ArgumentParser(description="Check and time many concurrent analyses in one event loop.")
+    parser.add_argument('--files', type=int, default=20000, help="files of the corpus (default: %(default)s)")
+    parser.add_argument('--analyses', type=int, default=24, help="analyses started at once (default: %(default)s)")
+    parser.add_argument('--max-concurrent', type=int, default=4,
+                        help="analyses allowed to run at once (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the corpus generator (default: %(default)s)")
+    args = parser.parse_args()
+
+    problems = run(args.files, args.analyses, args.max_concurrent, args.seed)
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
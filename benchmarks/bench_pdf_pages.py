@@ -0,0 +1,59 @@
+"""
+Compare PyPDF2 with the mmap-based page counter on every PDF under the given paths,
+reporting the time taken by both and the fraction of each file the page counter actually read.
+
+Usage: python benchmarks/bench_pdf_pages.py <file or directory> [...]
+"""
+import os
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PyPDF2 import PdfFileReader  # noqa: E402
+
+from backend import scan_files  # noqa: E402
+from pdf_pages import count_pdf_pages, PdfPageCountError  # noqa: E402
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    pypdf2_time, fast_time, total_size, total_read, fallbacks, mismatches = 0., 0., 0, 0, 0, 0
+    for path, file_type in scan_files(sys.argv[1:]):
+        if file_type != "doc":
+            continue
+        start = perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                expected = PdfFileReader(f, strict=False).getNumPages()
+        except Exception as e:
+            print(f"{path}: PyPDF2 failed: {e}")
+            expected = None
+        pypdf2_time += perf_counter() - start
+
+        start = perf_counter()
+        try:
+            pages, bytes_read = count_pdf_pages(path)
+        except PdfPageCountError as e:
+            print(f"{path}: falling back to PyPDF2: {e}")
+            fallbacks += 1
+            continue
+        finally:
+            fast_time += perf_counter() - start
+        size = os.path.getsize(path)
+        total_size += size
+        total_read += bytes_read
+        if pages != expected:
+            mismatches += 1
+            print(f"{path}: {pages} pages instead of {expected}")
+        print(f"{path}: {pages} pages, read {bytes_read} of {size} bytes ({100 * bytes_read / size:.3f}%)")
+
+    print(f"\nPyPDF2: {pypdf2_time:.3f} s, page counter: {fast_time:.3f} s, "
+          f"read {total_read} of {total_size} bytes, {fallbacks} fallbacks, {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Check ReleaseChecker (see release_check.py) against a local stand-in of the GitHub releases API, pointed to with the
+STUDY_PLANNER_RELEASES_URL environment variable: that a check is reused until its TTL expires, that an expired check
+is revalidated with the ETag and a 304 keeps the cached release, that a failed check is retried only after its own
+TTL, and that the whole check is given up on at the deadline when the server stalls after the headers or sends the
+response a few bytes at a time, each read within the read timeout.
+
+Usage: python benchmarks/bench_release_check.py [--total-timeout 1.0]
+Exits with 1 if a check fails.
+"""
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from release_check import RELEASES_URL_ENV, ReleaseChecker  # noqa: E402
+
+TAG_NAME = "v9.9.9"
+ETAG = '"release-etag"'
+# seconds the check may take past its deadline, for the thread switches
+DEADLINE_SLACK = 0.5
+
+
+class _Releases(BaseHTTPRequestHandler):
+    # answers as the server's mode says: 'ok', 'stall' (headers, then nothing) or 'dribble' (a byte at a time)
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get('If-None-Match'))
+        if server.mode == 'ok' and self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+        body = json.dumps({'tag_name': TAG_NAME}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', "application/json")
+        self.send_header('Content-Length', str(len(body) * 1000 if server.mode == 'dribble' else len(body)))
+        self.send_header('ETag', ETAG)
+        self.end_headers()
+        if server.mode == 'ok':
+            self.wfile.write(body)
+        elif server.mode == 'stall':
+            server.stopped.wait()
+        else:
+            while not server.stopped.wait(0.05):
+                self.wfile.write(b" ")
+                self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _expire(cache_file: str):
+    with open(cache_file, 'r') as f:
+        data = json.load(f)
+    data['checked'] -= 10 ** 6
+    with open(cache_file, 'w') as f:
+        json.dump(data, f)
+
+
+def run(total_timeout: float) -> bool:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Releases)
+    server.daemon_threads = True
+    server.mode, server.requests, server.stopped = 'ok', [], Event()
+    Thread(target=server.serve_forever, daemon=True).start()
+    os.environ[RELEASES_URL_ENV] = f"http://127.0.0.1:{server.server_address[1]}/releases/latest"
+    failures = []
+
+    def check(condition: bool, message: str):
+        print(f"{'ok' if condition else 'FAILED'}: {message}")
+        if not condition:
+            failures.append(message)
+
+    try:
+        with TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, "release.json")
+            checker = ReleaseChecker(cache_file, timeout=(1., 5.), total_timeout=total_timeout)
+            check(checker.latest_release() == TAG_NAME and server.requests == [None],
+                  "first check asks the server")
+            check(checker.latest_release() == TAG_NAME and len(server.requests) == 1,
+                  "check within the TTL is not asked again")
+            check(ReleaseChecker(cache_file).latest_release() == TAG_NAME and len(server.requests) == 1,
+                  "check is persisted for other checkers")
+
+            _expire(cache_file)
+            check(checker.latest_release() == TAG_NAME and server.requests[1:] == [ETAG],
+                  "expired check is revalidated with If-None-Match and the 304 keeps the release")
+            check(checker.latest_release() == TAG_NAME and len(server.requests) == 2,
+                  "revalidated check is reused for another TTL")
+
+            for mode, read_timeout in (('stall', 5.), ('dribble', 1.)):
+                server.mode = mode
+                _expire(cache_file)
+                checker = ReleaseChecker(cache_file, timeout=(1., read_timeout), total_timeout=total_timeout)
+                start = perf_counter()
+                latest_release = checker.latest_release()
+                elapsed = perf_counter() - start
+                check(elapsed < total_timeout + DEADLINE_SLACK,
+                      f"{mode}: check given up on after {elapsed:.2f} s, deadline {total_timeout} s")
+                with open(cache_file, 'r') as f:
+                    failed = json.load(f).get('failed')
+                check(failed and latest_release == TAG_NAME,
+                      f"{mode}: check is recorded as failed and the cached release is kept")
+                requests = len(server.requests)
+                checker.latest_release()
+                check(len(server.requests) == requests, f"{mode}: failed check is not retried before its TTL")
+    finally:
+        server.stopped.set()
+        server.shutdown()
+        server.server_close()
+    return not failures
+
+
+def main():
+    parser = ArgumentParser(description="Check the release check against a local server.")
+    parser.add_argument('--total-timeout', type=float, default=1.,
+                        help="seconds the whole check may take (default: %(default)s)")
+    args = parser.parse_args()
+    if not run(args.total_timeout):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
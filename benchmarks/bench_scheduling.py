@@ -0,0 +1,147 @@
+"""
+Time how long the slowest worker keeps the analysis going (the makespan) on skewed corpora: thousands of small
+documents and videos and a few big ones, placed at random in a tree, parsed by a stand-in parse function that sleeps
+for as long as parsing a file of its size takes (per file seconds plus size over a read rate), so that the timings
+only depend on the order and the grouping of the work and not on the disk.
+
+Every corpus is analysed in the order the files are found, then size-aware (see worker_pool.largest_first()) with
+the cost model as the analyzers estimate it, and then with the cost model learned from the first size-aware run.
+The lower bound is the longest file, or the total parse time spread evenly over the workers if that is longer.
+
+Usage: python benchmarks/bench_scheduling.py [--seeds 3] [--small 4000] [--big 8] [--workers 4] [--output out.json]
+Exits with 1 if the learned size-aware makespan is not shorter than in listing order on average, or if it is more
+than tolerance over the lower bound.
+"""
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from random import Random
+from statistics import mean
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import backend  # noqa: E402
+import worker_pool  # noqa: E402
+from corpus import make_dirs  # noqa: E402
+from cost_model import CostModel  # noqa: E402
+from file_index import FileIndex  # noqa: E402
+
+# the stand-in parse takes PARSE_SECONDS plus a second every READ_RATE bytes
+PARSE_SECONDS = 0.0002
+READ_RATE = 200e6
+SMALL_SIZES = (4 * 1024, 256 * 1024)
+BIG_SIZES = (40e6, 600e6)
+
+
+def _simulated_parse(path: str):
+    sleep(PARSE_SECONDS + os.path.getsize(path) / READ_RATE)
+    return 1, False
+
+
+def _simulated_cost(size: int) -> float:
+    return PARSE_SECONDS + size / READ_RATE
+
+
+def make_skewed_tree(root: str, small: int, big: int, seed: int) -> list:
+    # sizes of the files written, which are sparse so that big ones take no room on the disk
+    rnd = Random(seed)
+    dirs = make_dirs(root, 2, 6)
+    sizes = [rnd.randint(*SMALL_SIZES) for _ in range(small)] + [rnd.randint(*map(int, BIG_SIZES)) for _ in range(big)]
+    for i, size in enumerate(sizes):
+        ext = rnd.choice((".pdf", ".mp4"))
+        with open(os.path.join(rnd.choice(dirs), f"file{i}{ext}"), 'wb') as f:
+            f.truncate(size)
+    return sizes
+
+
+def _time_analysis(root: str, workers: int, size_aware: bool) -> tuple:
+    # seconds to parse every file and tasks submitted to the pool
+    tasks = [0]
+    run_chunk = worker_pool._run_chunk
+
+    def counting_run_chunk(func, chunk):
+        tasks[0] += 1
+        return run_chunk(func, chunk)
+
+    backend.worker_pool.configure(max_workers=workers, use_processes=False, size_aware=size_aware)
+    worker_pool._run_chunk = counting_run_chunk
+    try:
+        with TemporaryDirectory() as cache_dir:
+            backend.file_index = FileIndex(os.path.join(cache_dir, "index.sqlite3"))
+            start = perf_counter()
+            result = backend.get_result([root])
+            seconds = perf_counter() - start
+    finally:
+        worker_pool._run_chunk = run_chunk
+    if result['pdf_documents'] + result['videos'] == 0:
+        raise RuntimeError("No files were analysed")
+    return seconds, tasks[0]
+
+
+def run(seeds: int, small: int, big: int, workers: int) -> dict:
+    backend._get_parsers = lambda: {"doc": _simulated_parse, "vid": _simulated_parse}
+    runs = []
+    for seed in range(seeds):
+        with TemporaryDirectory() as root:
+            sizes = make_skewed_tree(root, small, big, seed)
+            costs = [_simulated_cost(size) for size in sizes]
+            lower_bound = max(max(costs), sum(costs) / workers)
+            listing_order = _time_analysis(root, workers, size_aware=False)
+            backend.cost_model = CostModel()
+            estimated = _time_analysis(root, workers, size_aware=True)
+            learned = _time_analysis(root, workers, size_aware=True)
+        runs.append({'seed': seed, 'lower_bound': lower_bound,
+                     'listing_order': listing_order[0], 'listing_order_tasks': listing_order[1],
+                     'size_aware_estimated': estimated[0], 'size_aware_estimated_tasks': estimated[1],
+                     'size_aware_learned': learned[0], 'size_aware_learned_tasks': learned[1]})
+        print(f"seed {seed}: lower bound {lower_bound:.3f} s, listing order {listing_order[0]:.3f} s "
+              f"({listing_order[1]} tasks), size-aware {estimated[0]:.3f} s ({estimated[1]} tasks), "
+              f"learned {learned[0]:.3f} s ({learned[1]} tasks)")
+    return {
+        'small': small,
+        'big': big,
+        'workers': workers,
+        'runs': runs,
+        'cost_model': {file_type: {'seconds_per_file': line[0], 'seconds_per_mb': line[1]}
+                       for file_type, line in backend.cost_model.lines.items()},
+    }
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the makespan of size-aware scheduling on skewed corpora.")
+    parser.add_argument('--seeds', type=int, default=3, help="corpora, each with its own layout (default: %(default)s)")
+    parser.add_argument('--small', type=int, default=4000, help="small files per corpus (default: %(default)s)")
+    parser.add_argument('--big', type=int, default=8, help="big files per corpus (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=4, help="threads of the pool (default: %(default)s)")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="makespan allowed over the lower bound (default: %(default)s)")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.seeds, args.small, args.big, args.workers)
+    runs = results['runs']
+    listing_order = mean(run['listing_order'] for run in runs)
+    learned = mean(run['size_aware_learned'] for run in runs)
+    lower_bound = mean(run['lower_bound'] for run in runs)
+    print(f"mean makespan: listing order {listing_order:.3f} s, size-aware {learned:.3f} s "
+          f"({learned / listing_order - 1:+.0%}), lower bound {lower_bound:.3f} s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    problems = []
+    if learned >= listing_order:
+        problems.append("size-aware scheduling is not faster than listing order")
+    if learned > lower_bound * (1 + args.tolerance):
+        problems.append(f"size-aware scheduling is {learned / lower_bound - 1:.0%} over the lower bound")
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
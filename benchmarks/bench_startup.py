@@ -0,0 +1,145 @@
+"""
+Time the start of the app: the time from launching the interpreter to the first paint of the window, with the
+offscreen Qt platform, and the import time of the modules of main.py as reported by python -X importtime.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--budget 1.5] [--output startup.json]
+Exits with 1 if the median time to first paint is over budget, or if a module that should only be imported on first
+use (see LAZY_MODULES) is imported at startup.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# imported when an analysis starts or when the release check runs, not before the window appears
+LAZY_MODULES = ("PyPDF2", "pymediainfo", "mediainfo_session", "requests", "urllib3", "concurrent.futures.process")
+
+# runs the same main() as the app, but quits at the first paint of any widget; the release check is left out
+# since it runs in its own thread after the window is shown and it needs the network
+_FIRST_PAINT = """
+import sys
+from time import perf_counter
+start = perf_counter()
+import main
+imported = perf_counter()
+from PyQt5.QtCore import QEvent, QObject
+from PyQt5.QtWidgets import QApplication
+
+class FirstPaintFilter(QObject):
+    painted = False
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and not self.painted:
+            self.painted = True
+            print(f"first paint {imported - start} {perf_counter() - start}", flush=True)
+            QApplication.instance().quit()
+        return False
+
+class FirstPaintApplication(QApplication):
+    def __init__(self, argv):
+        super().__init__(argv)
+        self.first_paint_filter = FirstPaintFilter()
+        self.installEventFilter(self.first_paint_filter)
+
+main.QApplication = FirstPaintApplication
+main.fetch_latest_release = lambda: None
+main.main()
+"""
+
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def _environment(home: str) -> dict:
+    env = dict(os.environ)
+    env['QT_QPA_PLATFORM'] = "offscreen"
+    # start from the default preferences, as on a first start
+    env['HOME'] = env['USERPROFILE'] = home
+    env['PYTHONPATH'] = os.pathsep.join([str(ROOT)] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    return env
+
+
+def time_first_paint(env: dict) -> dict:
+    start = perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", _FIRST_PAINT], cwd=str(ROOT), env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    timings = None
+    for line in process.stdout:
+        if line.startswith("first paint "):
+            timings = {'first_paint': perf_counter() - start}
+            import_main, first_paint_in_process = line.split()[2:]
+            timings['import_main'] = float(import_main)
+            timings['first_paint_in_process'] = float(first_paint_in_process)
+    process.wait()
+    if timings is None:
+        raise RuntimeError(f"The app exited with {process.returncode} before painting its window")
+    return timings
+
+
+def import_times(env: dict) -> list:
+    # (module, self seconds, cumulative seconds) of every module imported by main.py, in import order
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=str(ROOT), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    modules = []
+    for line in output.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            modules.append((match.group(3), int(match.group(1)) / 1e6, int(match.group(2)) / 1e6))
+    return modules
+
+
+def run(repeat: int, top: int) -> dict:
+    with TemporaryDirectory() as home:
+        env = _environment(home)
+        # the first start writes the bytecode caches
+        time_first_paint(env)
+        starts = [time_first_paint(env) for _ in range(repeat)]
+        modules = import_times(env)
+    results = {key: {'min': min(start[key] for start in starts), 'median': median(start[key] for start in starts),
+                     'max': max(start[key] for start in starts)}
+               for key in starts[0]}
+    slowest = sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+    results['slowest_imports'] = [{'module': module, 'self': self_time, 'cumulative': cumulative}
+                                  for module, self_time, cumulative in slowest]
+    imported = {module for module, _, _ in modules}
+    results['lazy_modules_imported'] = [lazy for lazy in LAZY_MODULES if lazy in imported]
+    return results
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the start of the app.")
+    parser.add_argument('--repeat', type=int, default=5, help="timed starts (default: %(default)s)")
+    parser.add_argument('--budget', type=float, default=1.5,
+                        help="seconds allowed for the median time to first paint (default: %(default)s)")
+    parser.add_argument('--top', type=int, default=15, help="slowest imports to show (default: %(default)s)")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.top)
+    for key in ('import_main', 'first_paint_in_process', 'first_paint'):
+        print(f"{key:>24}: median {results[key]['median']:.4f} s, min {results[key]['min']:.4f} s")
+    print("slowest imports (self time):")
+    for module in results['slowest_imports']:
+        print(f"{module['self'] * 1000:>10.1f} ms {module['cumulative'] * 1000:>10.1f} ms  {module['module']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    problems = [f"{module} is imported at startup" for module in results['lazy_modules_imported']]
+    if results['first_paint']['median'] > args.budget:
+        problems.append(f"the first paint took {results['first_paint']['median']:.4f} s, "
+                        f"over the budget of {args.budget} s")
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Time the backend functions on synthetic corpora (see corpus.py) of increasing size, check their results against
+the totals the corpus was generated with, and record the timings as JSON.
+
+Usage: python benchmarks/bench_suite.py [--sizes 100,1000,10000,100000] [--output results.json]
+                                        [--baseline previous.json] [--threshold 0.25]
+Exits with 1 if a result is wrong, or if a median time is more than threshold slower than in the baseline.
+"""
+import json
+import os
+import platform
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter, strftime
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import backend  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+from file_index import FileIndex  # noqa: E402
+
+# a regression must also be at least this many seconds, so that the smallest corpora do not fail on noise
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def _no_parse(path: str):
+    # measures the overhead of the walk, the cache and the pool alone (module level, so that processes can use it)
+    return 1, False
+
+
+def _cases(root: str, expected: dict, subtree: str, subtree_expected: dict) -> list:
+    # name, function, expected value and what to run before timing, with the same index
+    def index_root():
+        backend.get_result([root])
+
+    return [
+        ("get_result", lambda: backend.get_result([root]), expected, None),
+        ("get_result_warm_cache", lambda: backend.get_result([root]), expected, index_root),
+        ("get_result_indexed_subtree", lambda: backend.get_result([subtree]), subtree_expected, index_root),
+        ("get_total_files_doc", lambda: backend.get_total_files([root], "doc"), expected['pdf_documents'], None),
+        ("get_total_files_vid", lambda: backend.get_total_files([root], "vid"), expected['videos'], None),
+        ("get_total_pdf_pages", lambda: backend.get_total_pdf_pages([root]),
+         (expected['pdf_pages'], False), None),
+        ("get_total_video_seconds", lambda: backend.get_total_video_seconds([root]),
+         (int(expected['video_seconds'] * 1000), False), None),
+        ("run_multithreaded_no_parse", lambda: backend.run_multithreaded([root], _no_parse, "doc"),
+         (expected['pdf_documents'], False), None),
+    ]
+
+
+def _time_case(func, warm_up, repeat: int) -> tuple:
+    times, value = [], None
+    for _ in range(repeat):
+        # a new index every time, so that nothing parsed by a previous case or repetition is reused
+        with TemporaryDirectory() as cache_dir:
+            backend.file_index = FileIndex(os.path.join(cache_dir, "index.sqlite3"))
+            if warm_up is not None:
+                warm_up()
+            start = perf_counter()
+            value = func()
+            times.append(perf_counter() - start)
+    return times, value
+
+
+def run(sizes: list, depth: int, fan_out: int, repeat: int, seed: int) -> dict:
+    results = {
+        'date': strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': backend.worker_pool.max_workers,
+        'processes': backend.worker_pool.use_processes,
+        'depth': depth,
+        'fan_out': fan_out,
+        'repeat': repeat,
+        'seed': seed,
+        'timings': {},
+        'failures': [],
+    }
+    for size in sizes:
+        with TemporaryDirectory() as root:
+            start = perf_counter()
+            expected = make_corpus(root, size, depth, fan_out, seed)
+            print(f"{size} files: corpus generated in {perf_counter() - start:.3f} s")
+            # the first directory of the tree, e.g. a course in a degree
+            subtree = os.path.join(root, "dir0")
+            subtree_expected = _time_case(lambda: backend.get_result([subtree]), None, 1)[1]
+            timings = results['timings'][str(size)] = {}
+            for name, func, expected_value, warm_up in _cases(root, expected, subtree, subtree_expected):
+                times, value = _time_case(func, warm_up, repeat)
+                timings[name] = {'min': min(times), 'median': median(times), 'max': max(times)}
+                print(f"{size:>8} {name:>28}: median {median(times):.4f} s, min {min(times):.4f} s")
+                if value != expected_value:
+                    results['failures'].append(f"{name} on {size} files returned {value} instead of {expected_value}")
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for size, timings in results['timings'].items():
+        for name, timing in timings.items():
+            previous = baseline.get('timings', {}).get(size, {}).get(name)
+            if previous is None:
+                continue
+            limit = previous['median'] * (1 + threshold)
+            if timing['median'] > limit and timing['median'] - previous['median'] > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{name} on {size} files took {timing['median']:.4f} s, "
+                                   f"{timing['median'] / previous['median'] - 1:+.0%} over the baseline")
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the backend on synthetic corpora.")
+    parser.add_argument('--sizes', default="100,1000,10000,100000",
+                        help="comma separated numbers of files of every corpus (default: %(default)s)")
+    parser.add_argument('--depth', type=int, default=3, help="directory depth (default: %(default)s)")
+    parser.add_argument('--fan-out', type=int, default=6, help="subdirectories per directory (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs of every case (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the corpus generator (default: %(default)s)")
+    parser.add_argument('--processes', action='store_true', help="parse files in separate processes")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file written by a previous run to compare the results with")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="slowdown over the baseline median that fails the run (default: %(default)s)")
+    args = parser.parse_args()
+
+    backend.worker_pool.configure(use_processes=args.processes)
+    results = run([int(size) for size in args.sizes.split(",")], args.depth, args.fan_out, args.repeat, args.seed)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['regressions'] = find_regressions(results, json.load(f), args.threshold)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    problems = results['failures'] + results.get('regressions', [])
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Time the formatting done at every slider move (see ShowResult.update_analysis_labels): the messages of the four
+analysis labels, with and without the cache of human readable durations, and with the compiled messages compared
+with formatting the templates of the catalog with str.format at every call.
+
+Usage: python benchmarks/bench_translations.py [--lang en] [--number 20000]
+"""
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend import get_study_material, get_study_time  # noqa: E402
+from translations import LANGUAGE_PLURAL_RULES, Translator  # noqa: E402
+
+RESULT = {'pdf_pages': 1234, 'pdf_documents': 56, 'pdf_error': False,
+          'video_seconds': 98765, 'videos': 43, 'video_error': False}
+
+
+def _labels(t: Translator, human_readable_time, docs_seconds: int, vids_multiplier: float, day_hours: int) -> list:
+    study_time = get_study_time(RESULT, docs_seconds, vids_multiplier, day_hours)
+    material = get_study_material(RESULT)
+    return [
+        t.translate('docs_text', material['pages'], material['documents'],
+                    human_readable_time(docs_seconds), human_readable_time(study_time['docs_time'])),
+        t.translate('vids_text', human_readable_time(material['seconds']), material['recordings'], vids_multiplier,
+                    human_readable_time(study_time['vids_time'])),
+        t.translate('tot_text', human_readable_time(study_time['total_time'])),
+        t.translate('prep_text', t.get_hours(day_hours), t.get_days(study_time['days'])),
+    ]
+
+
+class _FormatAtEveryCall(Translator):
+    # looks up the template in the catalog and formats it with str.format at every call, as before it was compiled
+    def translate(self, msg: str, *args) -> str:
+        return self.translations[msg][self.lang].format(*args)
+
+    def plural(self, msg: str, n) -> str:
+        forms = self.translations[msg][self.lang]
+        return forms.get(self._plural_rule(n), forms['other']).format(n)
+
+
+def _best(func, number: int) -> float:
+    # microseconds per call
+    return min(repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the formatting of the analysis labels.")
+    parser.add_argument('--lang', default="en", help="language of the messages (default: %(default)s)")
+    parser.add_argument('--number', type=int, default=20000, help="calls per timing (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.lang not in LANGUAGE_PLURAL_RULES:
+        sys.exit(f"No messages in {args.lang}")
+    t = Translator(args.lang)
+    formatting = _FormatAtEveryCall(args.lang)
+    # a drag of the video speed slider from 0.1x to 5x
+    multipliers = [i / 10 for i in range(1, 51)]
+    moves = iter(range(sys.maxsize))
+
+    def slider_move_uncached():
+        _labels(t, t.human_readable_time.__wrapped__, 60, multipliers[next(moves) % 50], 5)
+
+    def slider_move_cached():
+        _labels(t, t.human_readable_time, 60, multipliers[next(moves) % 50], 5)
+
+    def slider_move_format():
+        _labels(formatting, formatting.human_readable_time.__wrapped__, 60, multipliers[next(moves) % 50], 5)
+
+    template = Translator.translations['tot_text'][args.lang]
+    timings = [
+        ("slider move, str.format, uncached durations", _best(slider_move_format, args.number)),
+        ("slider move, uncached durations", _best(slider_move_uncached, args.number)),
+        ("slider move, cached durations", _best(slider_move_cached, args.number)),
+        ("human_readable_time, str.format", _best(lambda: formatting.human_readable_time.__wrapped__(98765),
+                                                  args.number)),
+        ("human_readable_time, uncached", _best(lambda: t.human_readable_time.__wrapped__(98765), args.number)),
+        ("get_days, str.format", _best(lambda: formatting.get_days(12), args.number)),
+        ("get_days", _best(lambda: t.get_days(12), args.number)),
+        ("translate vids_text, str.format", _best(lambda: formatting.translate('vids_text', "1 hour", 3, 1.5,
+                                                                               "40 minutes"), args.number)),
+        ("translate vids_text, compiled", _best(lambda: t.translate('vids_text', "1 hour", 3, 1.5, "40 minutes"),
+                                                args.number)),
+        ("translate tot_text, str.format", _best(lambda: formatting.translate('tot_text', "1 hour"), args.number)),
+        ("translate tot_text, compiled", _best(lambda: t.translate('tot_text', "1 hour"), args.number)),
+        ("str.format alone", _best(lambda: template.format("1 hour"), args.number)),
+    ]
+    for name, microseconds in timings:
+        print(f"{name:>45}: {microseconds:.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare the number of directory traversals and the wall time of the file discovery done by get_result
+before (one Path.rglob per extension, repeated for pages, durations and both file counts) and after
+(a single os.scandir walk).
+
+Usage: python benchmarks/bench_traversal.py [directory]
+If no directory is given, a synthetic tree of empty files is generated in a temporary directory.
+PDFs and videos are not parsed, so that only the traversal is measured.
+"""
+import os
+import sys
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import backend  # noqa: E402
+from file_index import FileIndex  # noqa: E402
+
+
+class ScandirCounter:
+    # count every directory listing, Path.rglob uses os.scandir internally as well
+    def __init__(self):
+        self.calls = 0
+        self._scandir = os.scandir
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self._scandir(*args, **kwargs)
+
+    def __enter__(self):
+        os.scandir = self
+        return self
+
+    def __exit__(self, *exc):
+        os.scandir = self._scandir
+
+
+def _legacy_walks(path: str, exts: list) -> tuple:
+    # the file discovery of the previous implementation, one rglob per extension
+    found, walks = 0, 0
+    if Path(path).is_file():
+        return 1, 0
+    for ext in exts:
+        walks += 1
+        found += sum(1 for _ in Path(path).rglob(f"*{ext}"))
+    return found, walks
+
+
+def legacy_discovery(paths: list) -> tuple:
+    if len(paths) == 1 and Path(paths[0]).is_dir():
+        paths = [str(p) for p in Path(paths[0]).glob("*")] or paths
+    found, walks = 0, 0
+    # pages, durations, document count and video count each walked the tree again
+    for exts in (backend.doc_exts, backend.video_exts, backend.doc_exts, backend.video_exts):
+        for path in paths:
+            _found, _walks = _legacy_walks(path, exts)
+            found += _found
+            walks += _walks
+    return found // 2, walks  # every file was found once while parsing and once while counting
+
+
+def single_pass_discovery(paths: list) -> tuple:
+    backend._get_parsers = lambda: {
+        "doc": lambda _: (1, False),
+        "vid": lambda _: (1000., False),
+    }
+    result = backend.get_result(paths)
+    return result['pdf_documents'] + result['videos'], len(paths)
+
+
+def make_tree(root: str, files: int = 20000, fan_out: int = 8, depth: int = 3, seed: int = 0):
+    rnd = Random(seed)
+    exts = backend.doc_exts + backend.video_exts + [".txt", ".PDF", ".MP4", ".docx"]
+    dirs = [root]
+    for _ in range(depth):
+        dirs = [os.path.join(d, f"dir{i}") for d in dirs for i in range(fan_out)]
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+    for i in range(files):
+        open(os.path.join(rnd.choice(dirs), f"file{i}{rnd.choice(exts)}"), 'w').close()
+
+
+def bench(name: str, func, paths: list):
+    with ScandirCounter() as counter:
+        start = perf_counter()
+        found, walks = func(paths)
+        elapsed = perf_counter() - start
+    print(f"{name:>12}: {walks:>5} subtree walks, {counter.calls:>7} directory listings, "
+          f"{found:>7} files found, {elapsed:.3f} s")
+
+
+def main():
+    # keep the fake page counts and durations out of the real index
+    cache_dir = TemporaryDirectory()
+    backend.file_index = FileIndex(os.path.join(cache_dir.name, "index.sqlite3"))
+    if len(sys.argv) > 1:
+        paths = sys.argv[1:]
+        bench("before", legacy_discovery, paths)
+        bench("after", single_pass_discovery, paths)
+        return
+    with TemporaryDirectory() as root:
+        make_tree(root)
+        # the legacy discovery is case-sensitive, so it finds fewer files than the single pass
+        bench("before", legacy_discovery, [root])
+        bench("after", single_pass_discovery, [root])
+
+
+if __name__ == "__main__":
+    main()
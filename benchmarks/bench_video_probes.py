@@ -0,0 +1,71 @@
+"""
+Compare MediaInfo.parse with the reusable MediaInfo session and with the container header probes on every video
+under the given paths, reporting the time taken by each and any difference between the durations they return.
+
+Usage: python benchmarks/bench_video_probes.py <file or directory> [...]
+"""
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pymediainfo import MediaInfo  # noqa: E402
+
+from backend import scan_files  # noqa: E402
+from mediainfo_session import get_duration  # noqa: E402
+from video_probes import probe_duration, VideoProbeError  # noqa: E402
+
+TOLERANCE_MS = 50  # MediaInfo may pick the longest stream instead of the container duration
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    mediainfo_time, session_time, probe_time, videos, fallbacks, mismatches = 0., 0., 0., 0, 0, 0
+    for path, file_type in scan_files(sys.argv[1:]):
+        if file_type != "vid":
+            continue
+        videos += 1
+        start = perf_counter()
+        try:
+            expected = float(MediaInfo.parse(path).tracks[0].duration)
+        except Exception as e:
+            print(f"{path}: MediaInfo failed: {e}")
+            expected = None
+        mediainfo_time += perf_counter() - start
+
+        start = perf_counter()
+        try:
+            session_duration = get_duration(path)
+        except Exception as e:
+            print(f"{path}: MediaInfo session failed: {e}")
+            session_duration = None
+        session_time += perf_counter() - start
+        # the session must return exactly what MediaInfo.parse returns, to the millisecond
+        if (session_duration is None) != (expected is None) \
+                or (expected is not None and int(session_duration) != int(expected)):
+            mismatches += 1
+            print(f"{path}: MediaInfo session returned {session_duration} ms instead of {expected} ms")
+
+        start = perf_counter()
+        try:
+            duration = probe_duration(path)[0]
+        except VideoProbeError as e:
+            print(f"{path}: falling back to MediaInfo: {e}")
+            fallbacks += 1
+            continue
+        finally:
+            probe_time += perf_counter() - start
+        if expected is None or abs(duration - expected) > TOLERANCE_MS:
+            mismatches += 1
+            print(f"{path}: {duration} ms instead of {expected} ms")
+
+    print(f"\n{videos} videos, MediaInfo.parse: {mediainfo_time:.3f} s, MediaInfo session: {session_time:.3f} s, "
+          f"probes: {probe_time:.3f} s, "
+          f"{fallbacks} fallbacks, {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
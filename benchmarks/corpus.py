@@ -0,0 +1,245 @@
+"""
+Generate reproducible synthetic course trees: nested directories holding minimal valid PDFs and EPUBs with a known
+number of pages, PPTX and ODP presentations with a known number of slides, minimal MP4, MKV, FLV, AVI, MP3 and M4A
+files with a known duration, and files that are not analysed.
+
+Usage: python benchmarks/corpus.py <directory> [files] [depth] [fan out] [seed]
+The expected totals are printed as JSON and are the same get_result should return for the directory.
+"""
+import json
+import os
+import struct
+import sys
+import zipfile
+from io import BytesIO
+from random import Random
+from typing import List
+
+DOC_WEIGHT, VIDEO_WEIGHT, EPUB_WEIGHT, SLIDES_WEIGHT, AUDIO_WEIGHT, OTHER_WEIGHT = 6, 2, 1, 1, 1, 2
+MAX_PAGES = 40
+MAX_VIDEO_SECONDS = 3 * 3600
+MAX_CHAPTERS = 12
+MAX_SLIDES = 60
+OTHER_EXTS = [".txt", ".docx", ".png", ".zip"]
+
+
+def make_pdf(pages: int) -> bytes:
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (3 + i) for i in range(pages)) +
+            b"] /Count %d >>" % pages]
+    objs += [b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"] * pages
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % (i + 1) + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def _mp4_box(name: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), name) + payload
+
+
+def make_mp4(milliseconds: int) -> bytes:
+    timescale = 1000
+    mvhd = _mp4_box(b"mvhd", b"\0\0\0\0" + struct.pack(">IIII", 0, 0, timescale, milliseconds) + b"\0" * 80)
+    moov = _mp4_box(b"moov", mvhd + _mp4_box(b"trak", b"\0" * 8))
+    ftyp = _mp4_box(b"ftyp", b"isom\0\0\0\0isomiso2")
+    # the moov box is at the end, like in most files that were not optimised for streaming
+    return ftyp + _mp4_box(b"mdat", b"\0" * 64) + moov
+
+
+def _ebml_size(size: int) -> bytes:
+    length = 1
+    while size >= (1 << (7 * length)) - 1:
+        length += 1
+    return ((1 << (7 * length)) | size).to_bytes(length, 'big')
+
+
+def _ebml_element(element_id: int, data: bytes) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + _ebml_size(len(data)) + data
+
+
+def make_mkv(milliseconds: int) -> bytes:
+    header = _ebml_element(0x1A45DFA3, _ebml_element(0x4282, b"matroska"))
+    info = _ebml_element(0x1549A966, _ebml_element(0x2AD7B1, (1000000).to_bytes(3, 'big')) +
+                         _ebml_element(0x4489, struct.pack(">d", float(milliseconds))))
+    segment = _ebml_element(0x114D9B74, b"\0" * 16) + info + _ebml_element(0x1F43B675, b"\0" * 64)
+    return header + _ebml_element(0x18538067, segment)
+
+
+def _amf_string(s: bytes) -> bytes:
+    return struct.pack(">H", len(s)) + s
+
+
+def make_flv(milliseconds: int) -> bytes:
+    props = (_amf_string(b"width") + b"\0" + struct.pack(">d", 640) +
+             _amf_string(b"duration") + b"\0" + struct.pack(">d", milliseconds / 1000) + b"\0\0\x09")
+    data = b"\x02" + _amf_string(b"onMetaData") + b"\x08" + struct.pack(">I", 2) + props
+    tag = bytes([18]) + len(data).to_bytes(3, 'big') + b"\0" * 7 + data
+    return b"FLV\x01\x05" + struct.pack(">I", 9) + b"\0\0\0\0" + tag + struct.pack(">I", len(tag))
+
+
+def _riff_chunk(fourcc: bytes, data: bytes) -> bytes:
+    return struct.pack("<4sI", fourcc, len(data)) + data + (b"\0" if len(data) & 1 else b"")
+
+
+def _riff_list(list_type: bytes, data: bytes) -> bytes:
+    return _riff_chunk(b"LIST", list_type + data)
+
+
+def make_avi(milliseconds: int, fps: int = 25) -> bytes:
+    # milliseconds must be a multiple of 1000 / fps to be represented exactly
+    frames = milliseconds * fps // 1000
+    avih = _riff_chunk(b"avih", struct.pack("<IIIII", 1000000 // fps, 0, 0, 0, frames) + b"\0" * 36)
+    strh = _riff_chunk(b"strh", b"vids" + b"\0" * 16 + struct.pack("<IIII", 1, fps, 0, frames) + b"\0" * 20)
+    hdrl = _riff_list(b"hdrl", avih + _riff_list(b"strl", strh + _riff_chunk(b"strf", b"\0" * 40)))
+    body = b"AVI " + hdrl + _riff_list(b"movi", b"\0" * 16)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+_video_makers = {
+    ".mp4": make_mp4,
+    ".mkv": make_mkv,
+    ".flv": make_flv,
+    ".avi": make_avi,
+}
+
+
+def _zip(parts: List[tuple]) -> bytes:
+    out = BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in parts:
+            archive.writestr(name, data)
+    return out.getvalue()
+
+
+def make_epub(chapter_pages: List[int], bytes_per_page: int = 4096) -> bytes:
+    # every chapter is as big as its pages, see zip_probes.EPUB_BYTES_PER_PAGE
+    container = (b'<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0"><rootfiles>'
+                 b'<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+                 b'</rootfiles></container>')
+    items = b"".join(b'<item id="c%d" href="c%d.xhtml" media-type="application/xhtml+xml"/>' % (i, i)
+                     for i in range(len(chapter_pages)))
+    spine = b"".join(b'<itemref idref="c%d"/>' % i for i in range(len(chapter_pages)))
+    opf = (b'<package xmlns="http://www.idpf.org/2007/opf" version="3.0"><manifest>' + items +
+           b'</manifest><spine>' + spine + b'</spine></package>')
+    parts = [("mimetype", b"application/epub+zip"), ("META-INF/container.xml", container), ("OEBPS/content.opf", opf)]
+    parts += [(f"OEBPS/c{i}.xhtml", b"<p>" + b"x" * (pages * bytes_per_page - 7) + b"</p>")
+              for i, pages in enumerate(chapter_pages)]
+    return _zip(parts)
+
+
+def make_pptx(slides: int) -> bytes:
+    slide_type = b"application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+    overrides = b"".join(b'<Override PartName="/ppt/slides/slide%d.xml" ContentType="%s"/>' % (i + 1, slide_type)
+                         for i in range(slides))
+    content_types = (b'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">' + overrides +
+                     b'</Types>')
+    return _zip([("[Content_Types].xml", content_types)] +
+                [(f"ppt/slides/slide{i + 1}.xml", b"<p:sld/>") for i in range(slides)])
+
+
+def make_odp(slides: int) -> bytes:
+    content = (b'<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+               b'xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"><office:body><office:presentation>' +
+               b'<draw:page/>' * slides + b'</office:presentation></office:body></office:document-content>')
+    return _zip([("mimetype", b"application/vnd.oasis.opendocument.presentation"), ("content.xml", content)])
+
+
+def make_mp3(milliseconds: int) -> bytes:
+    # MPEG 1 layer III at 48 kHz, 128 kbit/s, with a Xing header, so that the file does not need the audio:
+    # frames of 1152 samples last 24 ms, milliseconds must be a multiple of 24 to be represented exactly
+    header = b"\xFF\xFB\x94\x00"
+    xing = b"Xing" + struct.pack(">II", 1, milliseconds // 24)
+    frame = header + b"\0" * 32 + xing
+    frame += b"\0" * (384 - len(frame))
+    return b"ID3\x04\0\0\0\0\0\0" + frame + header + b"\0" * 380
+
+
+def make_dirs(root: str, depth: int, fan_out: int) -> List[str]:
+    dirs, level = [root], [root]
+    for _ in range(depth):
+        level = [os.path.join(d, f"dir{i}") for d in level for i in range(fan_out)]
+        dirs += level
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+    return dirs
+
+
+def make_corpus(root: str, files: int = 1000, depth: int = 3, fan_out: int = 4, seed: int = 0) -> dict:
+    # write files spread over a tree of the given depth and fan out under root and return the expected result
+    rnd = Random(seed)
+    dirs = make_dirs(root, depth, fan_out)
+    expected = {
+        'pdf_pages': 0,
+        'pdf_error': False,
+        'pdf_documents': 0,
+        'video_seconds': 0.,
+        'video_error': False,
+        'videos': 0,
+        'epub_pages': 0,
+        'epub_error': False,
+        'epubs': 0,
+        'slides': 0,
+        'slides_error': False,
+        'slide_decks': 0,
+        'audio_seconds': 0.,
+        'audio_error': False,
+        'audio_files': 0,
+        'failed_files': [],
+    }
+    pdfs = {}  # only a few distinct page counts, so most PDFs are copies of the same bytes
+    for i in range(files):
+        kind = rnd.choices(("doc", "vid", "epub", "slides", "audio", "other"),
+                           (DOC_WEIGHT, VIDEO_WEIGHT, EPUB_WEIGHT, SLIDES_WEIGHT, AUDIO_WEIGHT, OTHER_WEIGHT))[0]
+        if kind == "doc":
+            pages = rnd.randint(1, MAX_PAGES)
+            if pages not in pdfs:
+                pdfs[pages] = make_pdf(pages)
+            name, data = f"slides{i}.pdf", pdfs[pages]
+            expected['pdf_pages'] += pages
+            expected['pdf_documents'] += 1
+        elif kind == "vid":
+            ext = rnd.choice(list(_video_makers))
+            seconds = rnd.randint(1, MAX_VIDEO_SECONDS)  # whole seconds are exact in every container
+            name, data = f"lecture{i}{ext}", _video_makers[ext](seconds * 1000)
+            expected['video_seconds'] += seconds
+            expected['videos'] += 1
+        elif kind == "epub":
+            chapter_pages = [rnd.randint(1, MAX_PAGES) for _ in range(rnd.randint(1, MAX_CHAPTERS))]
+            name, data = f"book{i}.epub", make_epub(chapter_pages)
+            expected['epub_pages'] += sum(chapter_pages)
+            expected['epubs'] += 1
+        elif kind == "slides":
+            slides = rnd.randint(1, MAX_SLIDES)
+            ext = rnd.choice((".pptx", ".odp"))
+            name, data = f"deck{i}{ext}", (make_pptx if ext == ".pptx" else make_odp)(slides)
+            expected['slides'] += slides
+            expected['slide_decks'] += 1
+        elif kind == "audio":
+            ext = rnd.choice((".mp3", ".m4a"))
+            seconds = rnd.randint(1, MAX_VIDEO_SECONDS // 3) * 3  # whole multiples of 24 ms as well
+            name, data = f"recording{i}{ext}", (make_mp3 if ext == ".mp3" else make_mp4)(seconds * 1000)
+            expected['audio_seconds'] += seconds
+            expected['audio_files'] += 1
+        else:
+            name, data = f"notes{i}{rnd.choice(OTHER_EXTS)}", b"not analysed\n"
+        with open(os.path.join(rnd.choice(dirs), name), 'wb') as f:
+            f.write(data)
+    return expected
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    args = [int(arg) for arg in sys.argv[2:]]
+    print(json.dumps(make_corpus(sys.argv[1], *args)))
+
+
+if __name__ == "__main__":
+    main()
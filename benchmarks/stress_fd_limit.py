@@ -0,0 +1,123 @@
+"""
+Analyse a large synthetic corpus (see corpus.py) with many more workers than the open file limit of the process
+allows files, to check that the parsers stay within the budget of file_io.py: every file must be parsed without
+errors, the process must never have more descriptors open than its limit, and none must be left open afterwards.
+
+Usage: python benchmarks/stress_fd_limit.py [--files 50000] [--fd-limit 16] [--workers 64] [--processes]
+Exits with 1 if a check fails. Only runs where the limit can be set (not on Windows); the descriptors open are
+counted where /proc/self/fd exists.
+"""
+import os
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_FD_DIR = "/proc/self/fd"
+
+
+def count_open_fds() -> int:
+    # minus the one used to list them
+    return len(os.listdir(_FD_DIR)) - 1
+
+
+class FdSampler(Thread):
+    # the most descriptors open at once while it runs, sampled as often as possible
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = 0
+        self._stop_event = Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, count_open_fds())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run(files: int, fd_limit: int, workers: int, processes: bool, seed: int) -> list:
+    # set before the first import of file_io, which sizes its budget from the limit
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (fd_limit, hard))
+    import backend
+    import file_io
+    from corpus import make_corpus
+    from file_index import FileIndex
+
+    problems = []
+    can_count = os.path.isdir(_FD_DIR)
+    backend.worker_pool.configure(max_workers=workers, use_processes=processes)
+    print(f"fd limit {fd_limit}, budget {file_io.budget.max_open} open files, {backend.worker_pool.max_workers} "
+          f"{'processes' if processes else 'threads'}")
+    with TemporaryDirectory() as root, TemporaryDirectory() as cache_dir:
+        start = perf_counter()
+        expected = make_corpus(root, files, 3, 6, seed)
+        print(f"{files} files: corpus generated in {perf_counter() - start:.3f} s")
+        if processes:
+            # the first pool of processes also starts the resource tracker of multiprocessing, whose pipe stays open
+            backend.file_index = FileIndex(os.path.join(cache_dir, "warm_up.sqlite3"))
+            backend.get_result([os.path.join(root, "dir0", "dir0", "dir0")])
+            backend.worker_pool.shutdown()
+        backend.file_index = FileIndex(os.path.join(cache_dir, "index.sqlite3"))
+        backend.file_index.touch([root])  # opens the index, which stays open
+        before = count_open_fds() if can_count else None
+        sampler = FdSampler()
+        if can_count:
+            sampler.start()
+        start = perf_counter()
+        result = backend.get_result([root])
+        seconds = perf_counter() - start
+        if can_count:
+            sampler.stop()
+        # the pipes to the worker processes are not left open, they are still needed
+        backend.worker_pool.shutdown()
+        # with processes, every process has its own budget and the files are opened in the workers
+        print(f"analysed in {seconds:.3f} s, at most {file_io.budget.peak_open_files} files open by the parsers "
+              f"of this process")
+        if result != expected:
+            failed = result['failed_files']
+            problems.append(f"{len(failed)} files failed, e.g. {failed[:3]}" if failed
+                            else f"the result {result} is not the expected {expected}")
+        if file_io.budget.open_files:
+            problems.append(f"{file_io.budget.open_files} slots of the budget were not released")
+        if can_count:
+            after = count_open_fds()
+            print(f"descriptors open: {before} before, at most {sampler.peak} during, {after} after")
+            if sampler.peak > fd_limit:
+                problems.append(f"{sampler.peak} descriptors were open at once, over the limit of {fd_limit}")
+            if after > before:
+                problems.append(f"{after - before} descriptors were left open")
+    return problems
+
+
+def main():
+    parser = ArgumentParser(description="Analyse a large corpus under a low limit of open files.")
+    parser.add_argument('--files', type=int, default=50000, help="files of the corpus (default: %(default)s)")
+    parser.add_argument('--fd-limit', type=int, default=16,
+                        help="soft limit of open files of the process (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=64, help="workers of the pool (default: %(default)s)")
+    parser.add_argument('--processes', action='store_true', help="parse files in separate processes")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the corpus generator (default: %(default)s)")
+    args = parser.parse_args()
+    if resource is None:
+        sys.exit("The limit of open files cannot be set on this platform")
+
+    problems = run(args.files, args.fd_limit, args.workers, args.processes, args.seed)
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Analyse many directories without a display and print one JSON line per directory, e.g.:
+python cli.py ~/courses/* --parallel 4 --docs-seconds 90 > sizes.jsonl
+"""
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from threading import Lock
+from typing import TextIO
+
+# PyQt5 is never imported, only the backend is needed
+from backend import get_result, get_study_time, retry_failed, worker_pool, PreferenceDefault
+from metrics import AnalysisMetrics
+
+_print_lock = Lock()
+
+
+def _parse_args(args):
+    parser = ArgumentParser(description="Estimate the time required to study the contents of each directory.")
+    parser.add_argument('roots', nargs='+', metavar='ROOT', help="file or directory to analyse on its own")
+    parser.add_argument('-j', '--parallel', type=int, default=2,
+                        help="number of roots analysed at the same time (default: %(default)s)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="size of the worker pool shared by every root (default: depends on the CPU count)")
+    parser.add_argument('--processes', action='store_true',
+                        help="parse files in separate processes to use every core")
+    parser.add_argument('--docs-seconds', type=int, default=PreferenceDefault.docs_seconds.value,
+                        help="seconds to study a pdf page (default: %(default)s)")
+    parser.add_argument('--vids-multiplier', type=float, default=PreferenceDefault.vids_multiplier.value,
+                        help="video playback speed (default: %(default)s)")
+    parser.add_argument('--day-hours', type=int, default=PreferenceDefault.day_hours.value,
+                        help="hours of study per day (default: %(default)s)")
+    parser.add_argument('--retries', type=int, default=0,
+                        help="times the files that could not be parsed are tried again (default: %(default)s)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="add where the time of every analysis went to its line")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile every analysis in a single thread and dump the stats under the app directory")
+    return parser.parse_args(args)
+
+
+def _analyse_root(root: str, args) -> dict:
+    if not os.path.exists(root):
+        raise FileNotFoundError(root)
+    metrics = AnalysisMetrics() if args.metrics else None
+    result = get_result([root], metrics=metrics, profile=args.profile)
+    for _ in range(args.retries):
+        if not result['failed_files']:
+            break
+        result = retry_failed(result)
+    line = {'root': root}
+    line.update(result)
+    line.update({
+        'docs_seconds': args.docs_seconds,
+        'vids_multiplier': args.vids_multiplier,
+        'day_hours': args.day_hours,
+    })
+    line.update(get_study_time(result, args.docs_seconds, args.vids_multiplier, args.day_hours))
+    if metrics is not None:
+        line['metrics'] = metrics.to_dict()
+    return line
+
+
+def _print_line(line: dict, out: TextIO):
+    with _print_lock:
+        print(json.dumps(line), file=out, flush=True)
+
+
+def main(args=None) -> int:
+    args = _parse_args(sys.argv[1:] if args is None else args)
+    worker_pool.configure(max_workers=args.workers, use_processes=args.processes)
+    failed, out = 0, sys.stdout
+    # the backend prints the errors of single files, keep them out of the JSON lines
+    with redirect_stdout(sys.stderr):
+        # roots only orchestrate their analysis, the actual parsing of every root happens on the shared worker pool
+        with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+            futures = {executor.submit(_analyse_root, root, args): root for root in args.roots}
+            for future in as_completed(futures):
+                try:
+                    _print_line(future.result(), out)
+                except Exception as e:
+                    failed += 1
+                    _print_line({'root': futures[future], 'error': f"{type(e).__name__}: {e}"}, out)
+        worker_pool.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from analyzers import get_analyzer
+
+# the estimate of an analyzer, see Analyzer.estimate_cost(), counts as this many files parsed of no size and as many
+# of PRIOR_MB, so that a few files do not override it but a whole analysis does
+PRIOR_WEIGHT = 10.
+PRIOR_MB = 100.
+
+
+class CostModel:
+    # seconds it should take to parse a file of a given type and size, as a + b * MB fitted by least squares per
+    # file type to the parse times observed so far, starting from the estimate of its analyzer;
+    # sums of the fit (weight, x, x^2, y, x * y) are kept instead of the observations, so it takes no memory
+    def __init__(self, prior_weight: float = PRIOR_WEIGHT):
+        self.prior_weight = prior_weight
+        self._sums = {}  # type: Dict[str, List[float]]
+        self._lines = {}  # type: Dict[str, Tuple[float, float]]
+        self._lock = Lock()
+
+    def _prior_sums(self, file_type: str) -> List[float]:
+        analyzer = get_analyzer(file_type)
+        sums = [0.] * 5
+        for mb in (0., PRIOR_MB):
+            self._add(sums, mb, analyzer.estimate_cost(int(mb * 1e6)), self.prior_weight)
+        return sums
+
+    @staticmethod
+    def _add(sums: List[float], mb: float, seconds: float, weight: float = 1.):
+        sums[0] += weight
+        sums[1] += weight * mb
+        sums[2] += weight * mb * mb
+        sums[3] += weight * seconds
+        sums[4] += weight * mb * seconds
+
+    @staticmethod
+    def _fit(sums: List[float]) -> Tuple[float, float]:
+        weight, x, xx, y, xy = sums
+        slope = (weight * xy - x * y) / (weight * xx - x * x)
+        if slope < 0:  # bigger files never take less, it is noise
+            return y / weight, 0.
+        intercept = (y - slope * x) / weight
+        if intercept < 0:
+            return 0., xy / xx
+        return intercept, slope
+
+    def estimate(self, file_type: str, size: int) -> float:
+        line = self._lines.get(file_type)
+        if line is None:
+            return get_analyzer(file_type).estimate_cost(size)
+        intercept, slope = line
+        return intercept + slope * size / 1e6
+
+    def observe(self, file_type: str, size: int, seconds: float):
+        with self._lock:
+            sums = self._sums.get(file_type)
+            if sums is None:
+                sums = self._sums[file_type] = self._prior_sums(file_type)
+            self._add(sums, size / 1e6, seconds)
+            self._lines[file_type] = self._fit(sums)
+
+    @property
+    def lines(self) -> Dict[str, Tuple[float, float]]:
+        # file type -> (seconds per file, seconds per MB) learned so far
+        return dict(self._lines)
@@ -0,0 +1,298 @@
+import os
+import sqlite3
+from itertools import count
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# (size, mtime_ns, file type, value, error), value is a count (e.g. of pages) or a duration in milliseconds
+Row = Tuple[int, int, str, float, bool]
+# files used again within this many seconds keep the time they were last used, so that answering a tree again soon
+# after does not write every row of it
+TOUCH_INTERVAL = 3600
+# rows read (and directories and files of a walk written) at a time, so that memory does not grow with the tree
+PAGE_SIZE = 500
+_ROW_COLUMNS = "path, size, mtime_ns, type, pages, duration, error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    pages INTEGER,
+    duration REAL,
+    error INTEGER NOT NULL,
+    last_seen REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _subtree_range(root: str) -> Tuple[str, str]:
+    # every path under root sorts between root + separator and root + the character after the separator,
+    # so that subtrees are range scans of the primary key
+    prefix = os.path.join(root, "")
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class FileIndex:
+    # SQLite index of every analysed file, keyed by absolute path, and of the modification time of every
+    # directory walked by a complete analysis: as long as neither the directories nor the files under a path changed,
+    # the totals of that path (e.g. a course inside an already analysed degree) come from the index without a walk;
+    # the least recently used files are forgotten once more than max_rows are indexed
+    def __init__(self, index_file: str, max_rows: int = 100000):
+        self.index_file = index_file
+        self.max_rows = max_rows
+        self._connection = None
+        self._pending = []  # rows set since the last save
+        self._lock = Lock()
+        self._walk_numbers = count()  # names the temporary tables of every TreeWalk
+        self._walk_tables = 0  # walks whose temporary tables exist
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.index_file).parent.mkdir(parents=True, exist_ok=True)
+            # shared between the analysis threads, every access holds self._lock
+            self._connection = sqlite3.connect(self.index_file, timeout=10, check_same_thread=False)
+            # another instance of the app may be reading while this one writes
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+            columns = [column[1] for column in self._connection.execute("PRAGMA table_info(files)")]
+            if "last_seen" not in columns:  # indexed by a version without the bound
+                self._connection.execute("ALTER TABLE files ADD COLUMN last_seen REAL NOT NULL DEFAULT 0")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS files_last_seen ON files (last_seen)")
+        return self._connection
+
+    @staticmethod
+    def key(path: str) -> Tuple[str, int, int]:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def _iter_select(self, table: str, columns: str, roots: List[str]) -> Iterator[tuple]:
+        # the rows at or under roots, in pages of PAGE_SIZE rows in path order (columns start with the path),
+        # the lock is only held while a page is read
+        for root in roots:
+            low, high = _subtree_range(root)
+            with self._lock:
+                self._save()
+                page = self._connect().execute(f"SELECT {columns} FROM {table} WHERE path = ?", (root,)).fetchall()
+            yield from page
+            after, operator = low, ">="
+            while True:
+                with self._lock:
+                    page = self._connect().execute(
+                        f"SELECT {columns} FROM {table} WHERE path {operator} ? AND path < ? ORDER BY path LIMIT ?",
+                        (after, high, PAGE_SIZE)).fetchall()
+                yield from page
+                if len(page) < PAGE_SIZE:
+                    break
+                after, operator = page[-1][0], ">"
+
+    @staticmethod
+    def _row(size: int, mtime_ns: int, file_type: str, pages: int, duration: float, error: int) -> Row:
+        return size, mtime_ns, file_type, pages if pages is not None else duration, bool(error)
+
+    def touch(self, paths: List[str]):
+        # the files under (or at) paths were used now
+        now = time()
+        with self._lock:
+            self._save()
+            connection = self._connect()
+            with connection:
+                for root in paths:
+                    root = os.path.abspath(root)
+                    low, high = _subtree_range(root)
+                    connection.execute("UPDATE files SET last_seen = ? WHERE (path = ? OR (path >= ? AND path < ?)) "
+                                       "AND last_seen < ?", (now, root, low, high, now - TOUCH_INTERVAL))
+
+    def lookup(self, paths: List[str]) -> Dict[str, Row]:
+        # the rows of the given absolute paths that are indexed, with one query for up to PAGE_SIZE paths;
+        # rows set since the last save are not saved first, a lookup per directory would commit them every time
+        rows = {}
+        with self._lock:
+            for start in range(0, len(paths), PAGE_SIZE):
+                page = paths[start:start + PAGE_SIZE]
+                for path, *row in self._connect().execute(
+                        f"SELECT {_ROW_COLUMNS} FROM files WHERE path IN ({', '.join('?' * len(page))})", page):
+                    rows[path] = self._row(*row)
+        return rows
+
+    def iter_rows(self, paths: List[str]) -> Iterator[Tuple[str, Row]]:
+        # every file indexed under (or at) the given paths
+        roots = [os.path.abspath(path) for path in paths]
+        for path, *row in self._iter_select("files", _ROW_COLUMNS, roots):
+            yield path, self._row(*row)
+
+    def _check_signature(self, signature: str):
+        # the directories were walked looking for other extensions, e.g. before an analyzer was registered:
+        # files of the types added since were never found, so no tree is complete anymore
+        connection = self._connect()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            with connection:
+                connection.execute("DELETE FROM dirs")
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (signature,))
+
+    def is_fresh(self, paths: List[str], signature: str) -> bool:
+        # whether none of the files under paths changed since they were indexed by a complete analysis with the same
+        # signature of the analyzers (see analyzers.get_signature()), so that iter_rows() has them all: checked
+        # without a walk but with one stat per file and directory
+        roots = [os.path.abspath(path) for path in paths]
+        with self._lock:
+            self._save()
+            self._check_signature(signature)
+            connection = self._connect()
+            for root in roots:
+                if (connection.execute("SELECT 1 FROM dirs WHERE path = ?", (root,)).fetchone() is None
+                        and connection.execute("SELECT 1 FROM files WHERE path = ?", (root,)).fetchone() is None):
+                    return False
+        try:
+            for path, mtime_ns in self._iter_select("dirs", "path, mtime_ns", roots):
+                # files were added, removed or renamed in it
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    return False
+            for path, size, mtime_ns, error in self._iter_select("files", "path, size, mtime_ns, error", roots):
+                # files with errors are always parsed again, the error may have been temporary
+                stat = os.stat(path)
+                if error or stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                    return False
+        except OSError:  # removed
+            return False
+        return True
+
+    def new_walk(self) -> "TreeWalk":
+        return TreeWalk(self, next(self._walk_numbers))
+
+    def set(self, path: str, size: int, mtime_ns: int, file_type: str, value: float, error: bool):
+        with self._lock:
+            # counts in the pages column and durations in the duration one, whatever the type of file
+            counted = isinstance(value, int)
+            self._pending.append((path, size, mtime_ns, file_type,
+                                  value if counted else None,
+                                  value if not counted else None, error, time()))
+
+    def update_tree(self, paths: List[str], walk: "TreeWalk", signature: str):
+        # after a complete analysis of paths with the analyzers of the given signature, in which the directories and
+        # the files of walk were found: forget what is not there anymore and remember when the directories were listed
+        roots = [os.path.abspath(path) for path in paths]
+        with self._lock:
+            self._save()
+            walk._flush()
+            self._check_signature(signature)
+            connection = self._connect()
+            with connection:
+                for root in roots:
+                    low, high = _subtree_range(root)
+                    connection.execute(f"DELETE FROM files WHERE (path = ? OR (path >= ? AND path < ?)) "
+                                       f"AND path NOT IN (SELECT path FROM {walk.files_table})", (root, low, high))
+                    if walk.complete:
+                        connection.execute(f"DELETE FROM dirs WHERE (path = ? OR (path >= ? AND path < ?)) "
+                                           f"AND path NOT IN (SELECT path FROM {walk.dirs_table})", (root, low, high))
+                    else:
+                        # the files of the directories that could not be listed are unknown, the tree must be
+                        # walked again next time
+                        connection.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                                           (root, low, high))
+                if walk.complete:
+                    connection.execute(f"INSERT OR REPLACE INTO dirs SELECT path, mtime_ns FROM {walk.dirs_table}")
+            self._prune()
+
+    def _prune(self):
+        # forget the least recently used files beyond max_rows, and that the directories containing them were
+        # completely indexed, since their totals cannot come from the index anymore
+        connection = self._connect()
+        excess = connection.execute("SELECT COUNT(*) FROM files").fetchone()[0] - self.max_rows
+        if excess <= 0:
+            return
+        evicted = [path for path, in connection.execute("SELECT path FROM files ORDER BY last_seen LIMIT ?",
+                                                        (excess,))]
+        parents = set()
+        for path in evicted:
+            parent = os.path.dirname(path)
+            while parent not in parents and parent != os.path.dirname(parent):
+                parents.add(parent)
+                parent = os.path.dirname(parent)
+        with connection:
+            connection.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in evicted))
+            connection.executemany("DELETE FROM dirs WHERE path = ?", ((path,) for path in parents))
+
+    def _save(self):
+        if not self._pending:
+            return
+        connection = self._connect()
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+        self._pending = []
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+
+class TreeWalk:
+    # the directories walked (with their mtime_ns before listing them) and the files found by an analysis,
+    # written to temporary tables of the index PAGE_SIZE at a time instead of being kept in memory,
+    # see FileIndex.update_tree(); close() drops them; complete is False once a directory could not be listed
+    def __init__(self, index: FileIndex, number: int):
+        self.index = index
+        self.files_table = f"temp.walk_{number}_files"
+        self.dirs_table = f"temp.walk_{number}_dirs"
+        self._files = []
+        self._dirs = []
+        self._created = False
+        self.complete = True
+
+    def add_dir(self, path: str, mtime_ns: Optional[int]):
+        if mtime_ns is None:
+            self.complete = False
+            return
+        self._dirs.append((path, mtime_ns))
+        if len(self._dirs) >= PAGE_SIZE:
+            with self.index._lock:
+                self._flush()
+
+    def add_file(self, path: str):
+        self._files.append((path,))
+        if len(self._files) >= PAGE_SIZE:
+            with self.index._lock:
+                self._flush()
+
+    def _flush(self):
+        # called with the lock of the index held
+        connection = self.index._connect()
+        with connection:
+            if not self._created:
+                # without keys, which would only slow down the inserts: SQLite indexes the result of the
+                # subqueries of update_tree() by itself
+                connection.execute(f"CREATE TABLE {self.files_table} (path TEXT)")
+                connection.execute(f"CREATE TABLE {self.dirs_table} (path TEXT, mtime_ns INTEGER)")
+                self._created = True
+                self.index._walk_tables += 1
+            connection.executemany(f"INSERT INTO {self.files_table} VALUES (?)", self._files)
+            connection.executemany(f"INSERT INTO {self.dirs_table} VALUES (?, ?)", self._dirs)
+        self._files, self._dirs = [], []
+
+    def close(self):
+        with self.index._lock:
+            self._files, self._dirs = [], []
+            if self._created:
+                connection = self.index._connect()
+                with connection:
+                    connection.execute(f"DROP TABLE {self.files_table}")
+                    connection.execute(f"DROP TABLE {self.dirs_table}")
+                self._created = False
+                self.index._walk_tables -= 1
+                if not self.index._walk_tables:
+                    # SQLite keeps the file its temporary tables spilled to open until the temp_store setting
+                    # changes, which closes the temporary database: it is reopened by the next walk if needed
+                    connection.execute("PRAGMA temp_store = MEMORY")
+                    connection.execute("PRAGMA temp_store = DEFAULT")
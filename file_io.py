@@ -0,0 +1,110 @@
+import errno
+import mmap
+from contextlib import contextmanager
+from threading import Condition
+from time import sleep
+from typing import BinaryIO, Iterator, Optional, Union
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# file descriptors left to the rest of the app (the file index, Qt, the release check, the standard streams)
+FD_RESERVE = 64
+# open files allowed when the limit of the process is unknown or unlimited
+DEFAULT_MAX_OPEN_FILES = 256
+# an open that still fails with too many open files (e.g. because of another part of the app) is tried again
+# after waiting this many seconds, doubled every time
+_OPEN_RETRY_DELAYS = (0.01, 0.02, 0.04, 0.08)
+
+
+def default_max_open_files() -> int:
+    # half of what the soft limit of the process leaves after the reserve, since a mapped file briefly needs
+    # two descriptors: the one it was opened with and the one the map keeps
+    if resource is None:
+        return DEFAULT_MAX_OPEN_FILES
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return DEFAULT_MAX_OPEN_FILES
+    return max(1, (soft - min(FD_RESERVE, soft // 2)) // 2)
+
+
+class FileBudget:
+    # at most max_open files opened by the parsers at the same time, however many workers parse them:
+    # every file is opened in a slot, and workers wait for a free slot instead of failing with too many open files
+    def __init__(self, max_open: Optional[int] = None):
+        self.max_open = max_open or default_max_open_files()
+        self.open_files = 0
+        self.peak_open_files = 0  # since the start, or the last configure()
+        self._condition = Condition()
+
+    def configure(self, max_open: Optional[int] = None):
+        # files already open are closed as usual, new ones wait until there are less than max_open
+        with self._condition:
+            self.max_open = max_open or default_max_open_files()
+            self.peak_open_files = self.open_files
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._condition:
+            while self.open_files >= self.max_open:
+                self._condition.wait()
+            self.open_files += 1
+            self.peak_open_files = max(self.peak_open_files, self.open_files)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.open_files -= 1
+                self._condition.notify()
+
+
+budget = FileBudget()  # shared by every parser of this process, see budget.configure() to resize it
+
+
+def _open(path: str) -> BinaryIO:
+    for delay in _OPEN_RETRY_DELAYS:
+        try:
+            return open(path, 'rb')
+        except OSError as e:
+            if e.errno not in (errno.EMFILE, errno.ENFILE):
+                raise
+        sleep(delay)
+    return open(path, 'rb')
+
+
+@contextmanager
+def open_file(path: str) -> Iterator[BinaryIO]:
+    # the file opened for binary reading in a slot of the budget, closed as soon as the block exits
+    with budget.slot():
+        with _open(path) as f:
+            yield f
+
+
+@contextmanager
+def map_file(path: str) -> Iterator[Union[mmap.mmap, bytes]]:
+    # the whole file mapped read-only in a slot of the budget, unmapped as soon as the block exits, so that only
+    # the pages that are actually read are loaded; an empty file cannot be mapped and is b"" instead
+    with budget.slot():
+        with _open(path) as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                data = None
+        # the map keeps its own descriptor, the one of the file is already closed
+        if data is None:
+            yield b""
+            return
+        try:
+            yield data
+        finally:
+            data.close()
+
+
+@contextmanager
+def reserve_file() -> Iterator[None]:
+    # a slot of the budget for a file opened by a library, e.g. libmediainfo, for as long as the block runs
+    with budget.slot():
+        yield
@@ -1,61 +1,131 @@
 from pathlib import Path
 from sys import argv, exit as sysexit, platform
 import sys
-from typing import List
+from typing import Iterable, List, Optional
 from time import time
 from math import ceil
 from contextlib import redirect_stderr
+from html import escape
+from multiprocessing import freeze_support
 
-from PyQt5.QtCore import QRect, pyqtSignal, QThread, Qt
+from PyQt5.QtCore import QRect, pyqtSignal, QThread, QTimer, Qt
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QFileDialog, QHBoxLayout, QVBoxLayout, \
-    QPushButton, QFrame, QLineEdit, QDialog, QStackedWidget, QTreeView, QSlider
+    QPushButton, QFrame, QLineEdit, QDialog, QStackedWidget, QTreeView, QSlider, QDialogButtonBox
 from PyQt5.QtGui import QFont, QIcon, QCloseEvent, QPalette, QColor
-import requests
 
-from backend import get_result, Preference, PreferenceDefault, get_preference, set_preference, \
-    DB_PATH, CURRENT_RELEASE
+from analyzers import PLAY, READ, get_analyzers
+from backend import (iter_analysis, get_study_time, CancellationToken, AnalysisCancelled, Preference,
+                     PreferenceDefault, get_preference, set_preference, flush_preferences, retry_failed,
+                     get_result_from_files, get_study_material, DB_PATH, RELEASE_FILE, CURRENT_RELEASE, worker_pool)
+from metrics import AnalysisMetrics
+from release_check import ReleaseChecker
+from watcher import watch_analysis
 from waiting_spinner_widget import QtWaitingSpinner
 from translations import Translator
 
 
 class Analyser(QThread):
     result_signal = pyqtSignal(dict)
-
-    def __init__(self, paths: List[str]):
+    # running totals, emitted at most once every progress_interval seconds while the analysis is running
+    progress_signal = pyqtSignal(dict)
+    progress_interval = 0.2
+    # see AnalysisMetrics.to_dict(), emitted right before result_signal
+    metrics_signal = pyqtSignal(dict)
+    profile = False  # see iter_analysis(), enabled with --profile
+
+    def __init__(self, paths: List[str], files: Optional[dict] = None):
         QThread.__init__(self)
         self.paths = paths
+        self.files = files
+        self.token = CancellationToken()
 
     def run(self):
         start = time()
-        self.result_signal.emit(get_result(self.paths))
+        metrics = AnalysisMetrics()
+        try:
+            for progress in iter_analysis(self.paths, interval=self.progress_interval, token=self.token,
+                                          metrics=metrics, profile=self.profile, files=self.files):
+                if progress['done']:
+                    self.metrics_signal.emit(metrics.to_dict())
+                    self.result_signal.emit(progress['result'])
+                else:
+                    self.progress_signal.emit(progress)
+        except AnalysisCancelled:
+            print(f"Analysis of the following paths cancelled:\n{self.paths}\n--> after {time() - start} s")
+            return
         print(f"Time taken to analyse the following paths:\n{self.paths}\n--> {time() - start} s")
 
+    def cancel(self):
+        self.token.cancel()
+
+
+class Watcher(QThread):
+    # emitted every time the files of the analysed paths change, with the updated result
+    result_signal = pyqtSignal(dict)
+
+    def __init__(self, paths: List[str], files: dict):
+        QThread.__init__(self)
+        self.paths = paths
+        self.files = files
+        self.token = CancellationToken()
+
+    def run(self):
+        try:
+            for result in watch_analysis(self.paths, self.files, self.token):
+                self.result_signal.emit(result)
+        except AnalysisCancelled:
+            pass
+
+    def cancel(self):
+        self.token.cancel()
+
+
+class Retrier(QThread):
+    # emitted with the result in which the failed files were parsed again, see retry_failed()
+    result_signal = pyqtSignal(dict)
+
+    def __init__(self, result: dict, files: Optional[dict] = None):
+        QThread.__init__(self)
+        self.result = result
+        self.files = files
+        self.token = CancellationToken()
+
+    def run(self):
+        try:
+            self.result_signal.emit(retry_failed(self.result, self.files, self.token))
+        except AnalysisCancelled:
+            pass
+
+    def cancel(self):
+        self.token.cancel()
+
+
+# analysers, watchers and retriers that were cancelled but are still finishing the files they were parsing,
+# referenced here so that they are not garbage collected while their thread is still running
+_cancelled_threads = set()
+# how long to wait for a cancelled analysis to finish the files it was parsing when the window is closed
+ANALYSER_STOP_TIMEOUT_MS = 5000
+
 
 class ReleaseFetcher(QThread):
-    # only emitted if there is a new release
+    # emitted with the latest release, or with CURRENT_RELEASE if it is not newer
     new_release_signal = pyqtSignal(str)
-    new_release = None  # cache to prevent spamming HTTP requests
 
     def run(self):
-        if self.new_release:
-            self.new_release_signal.emit(self.new_release)
-        try:
-            res = requests.get("https://api.github.com/repos/e-caste/study-planner/releases/latest")
-            latest_release = res.json()['tag_name'] if 'tag_name' in res.json() else None
-            if latest_release:
-                is_new_release = latest_release > CURRENT_RELEASE  # string comparison
-                self.new_release = latest_release if is_new_release else CURRENT_RELEASE
-                self.new_release_signal.emit(self.new_release)
-                print(f"New release found: {self.new_release}" if is_new_release else "Already on latest release.")
-        except Exception as e:
-            print(e, file=sys.stderr)
+        latest_release = release_checker.latest_release()
+        if latest_release:
+            is_new_release = latest_release > CURRENT_RELEASE  # string comparison
+            self.new_release_signal.emit(latest_release if is_new_release else CURRENT_RELEASE)
+            print(f"New release found: {latest_release}" if is_new_release else "Already on latest release.")
 
 
+# the latest release is asked to GitHub at most once a day, see ReleaseChecker
+release_checker = ReleaseChecker(RELEASE_FILE)
 release_fetcher = ReleaseFetcher()
 
 
 def fetch_latest_release():
-    release_fetcher.new_release_signal.connect(_add_link_to_new_release)
+    # a check still running (e.g. on a slow network) is not started again, its result is shown when it is done
     release_fetcher.start()
 
 
@@ -69,6 +139,9 @@ def _add_link_to_new_release(new_release: str):
     window.centralWidget().showing_new_release = True
 
 
+release_fetcher.new_release_signal.connect(_add_link_to_new_release)
+
+
 class Window(QMainWindow):
     def __init__(self):
         # noinspection PyArgumentList
@@ -83,10 +156,12 @@ class Window(QMainWindow):
     # save preferences to file before closing the program
     def closeEvent(self, event: QCloseEvent):
         if isinstance(self.centralWidget(), ShowResult):
+            self.centralWidget().cancel_analysis(wait=True)
             save_slider_preferences(self.centralWidget())
         set_preference(Preference.dark_mode.value,
                        PreferenceDefault.dark_mode.value,
                        window.dark_mode_enabled)
+        flush_preferences()
         event.accept()
 
     def init_ui(self):
@@ -146,6 +221,8 @@ class LoadingScreen(QVBoxLayout):
         super().__init__()
         self.loading_text = QLabel(t.translate('waiting'))
         self.loading_spinner = QtWaitingSpinner()
+        self.progress_text = QLabel("")
+        self.progress_text.setAlignment(Qt.AlignCenter)
 
         if show_spinner:
             h_box_spinner = QHBoxLayout()
@@ -153,6 +230,7 @@ class LoadingScreen(QVBoxLayout):
             h_box_spinner.addWidget(self.loading_spinner)
             h_box_spinner.addStretch()
             self.addLayout(h_box_spinner)
+            self.addWidget(self.progress_text)
             self.loading_spinner.start()
         else:
             h_box_text = QHBoxLayout()
@@ -224,6 +302,9 @@ class FileDialog(QWidget):
     def show_result_widget(self):
         paths = get_open_files_and_dirs(caption=self.title,
                                         directory=self.last_dir)
+        # stop parsing the previous selection, it would compete with the new one for disk and CPU
+        if isinstance(window.centralWidget(), ShowResult):
+            window.centralWidget().cancel_analysis()
         if not paths:
             window.takeCentralWidget()
             window.setCentralWidget(Welcome(retry=True))
@@ -246,22 +327,37 @@ class HLine(QFrame):
 
 
 class ShowResult(QWidget):
+    watch_files = False  # keep the result up to date while files change, see Preference.watch_files
+    # analysis labels that depend on the value set by each slider, the others are left as they are while it moves
+    slider_labels = {
+        'docs_seconds': {'docs', 'tot', 'prep'},
+        'vids_multiplier': {'vids', 'tot', 'prep'},
+        'day_hours': {'prep'},
+    }
+    # the slider moves in between are applied together, once per frame at 60 Hz
+    label_update_interval_ms = 16
+
     def __init__(self, paths: List[str]):
         # noinspection PyArgumentList
         super().__init__()
 
-        self.analyser = Analyser(paths)
+        self.paths = paths
+        # path -> (file type, value, error) of every file analysed, only needed to apply the changes of watched files
+        self.files = {} if self.watch_files else None
+        self.analyser = Analyser(paths, self.files)
+        self.watcher = None
+        self.retrier = None
+        self.retry_button = None
         self.loading_screen = LoadingScreen(show_spinner=True)
         self.showing_new_release = False
+        self.metrics = None
+        self.outdated_labels = set()
+        self.label_timer = QTimer(self)
+        self.label_timer.setSingleShot(True)
+        self.label_timer.setInterval(self.label_update_interval_ms)
+        self.label_timer.timeout.connect(self.update_outdated_labels)
 
-        self.result = {
-            'pdf_pages': 0,
-            'pdf_error': False,
-            'pdf_documents': 0,
-            'video_seconds': 0,
-            'video_error': False,
-            'videos': 0,
-        }
+        self.result = get_result_from_files({})
 
         self.docs_seconds = get_preference(Preference.docs_seconds,
                                            PreferenceDefault.docs_seconds,
@@ -318,12 +414,89 @@ class ShowResult(QWidget):
         self.show_loading_screen()
 
     def show_loading_screen(self):
+        # choosing other files while the analysis is running cancels it
+        choose_directory_button = QPushButton(t.translate('choose_button'))
+        choose_directory_button.clicked.connect(self.click_directory_button)
+        h_box = QHBoxLayout()
+        h_box.addStretch()
+        h_box.addWidget(choose_directory_button)
+        h_box.addStretch()
+        self.loading_screen.addLayout(h_box)
         self.setLayout(self.loading_screen)
 
+    def cancel_analysis(self, wait: bool = False):
+        if self.watcher is not None and self.watcher.isRunning():
+            self.watcher.result_signal.disconnect()
+            _cancel_thread(self.watcher, wait)
+        if self.retrier is not None and self.retrier.isRunning():
+            self.retrier.result_signal.disconnect()
+            _cancel_thread(self.retrier, wait)
+        if not self.analyser.isRunning():
+            return
+        # a late result must not replace the widget of the new analysis
+        self.analyser.progress_signal.disconnect()
+        self.analyser.metrics_signal.disconnect()
+        self.analyser.result_signal.disconnect()
+        _cancel_thread(self.analyser, wait)
+
     def get_analysis_threaded(self):
+        self.analyser.progress_signal.connect(self.show_progress)
+        self.analyser.metrics_signal.connect(self.set_metrics)
         self.analyser.result_signal.connect(self.init_ui)
+        self.analyser.result_signal.connect(self.start_watching)
         self.analyser.start()
 
+    def start_watching(self):
+        if self.files is None:
+            return
+        self.watcher = Watcher(self.paths, self.files)
+        self.watcher.result_signal.connect(self.update_result)
+        self.watcher.start()
+
+    def update_result(self, result: dict):
+        # the sections of the layout depend on whether there are documents and videos at all
+        material, new_material = get_study_material(self.result), get_study_material(result)
+        if any((material[key] > 0) != (new_material[key] > 0) for key in ('pages', 'seconds')):
+            self.init_ui(result)
+        else:
+            self.result = result
+            self.update_analysis_labels()
+            self.update_retry_button()
+
+    def retry_failed_files(self):
+        if self.retrier is not None and self.retrier.isRunning():
+            return
+        self.retry_button.setEnabled(False)
+        self.retrier = Retrier(self.result, self.files)
+        self.retrier.result_signal.connect(self.update_result)
+        self.retrier.start()
+
+    def update_retry_button(self):
+        # only shown if some files could not be parsed, with their paths and errors in its tooltip
+        failed_files = self.result['failed_files']
+        self.retry_button.setHidden(not failed_files)
+        self.retry_button.setEnabled(True)
+        self.retry_button.setText(t.plural('retry_button', len(failed_files)))
+        self.retry_button.setToolTip("\n".join(f"{failed['path']} ({failed['error']})" for failed in failed_files))
+
+    def show_progress(self, progress: dict):
+        progress_text = t.translate('progress_text',
+                                    progress['files_analysed'],
+                                    progress['files_found'],
+                                    progress['pages'],
+                                    t.human_readable_time(int(progress['seconds'])))
+        if progress['errors']:
+            progress_text += t.translate('progress_errors', progress['errors'])
+        if progress['eta'] is not None:
+            progress_text += t.translate('progress_eta', t.human_readable_time(ceil(progress['eta'])))
+        self.loading_screen.progress_text.setText(progress_text.replace("\n", "<br>"))
+
+    def set_metrics(self, metrics: dict):
+        self.metrics = metrics
+
+    def show_details(self):
+        DetailsDialog(self.metrics, parent=self).exec_()
+
     # https://stackoverflow.com/a/10439207
     def replace_layout(self, new_layout):
         QWidget().setLayout(self.layout())
@@ -381,7 +554,8 @@ class ShowResult(QWidget):
             v_box.addWidget(self.analysis_tot)
             height += int(1/4 * self.analysis_docs.height() + font_height)
 
-        if self.result['pdf_pages'] > 0 or self.result['video_seconds'] > 0:
+        material = get_study_material(self.result)
+        if material['pages'] > 0 or material['seconds'] > 0:
             v_box.addWidget(HLine())
             v_box.addLayout(h_box_prep)
             v_box.addWidget(self.analysis_prep)
@@ -398,10 +572,19 @@ class ShowResult(QWidget):
         h_box.addWidget(choose_directory_button)
         if not platform.startswith("darwin"):
             h_box.addWidget(toggle_dark_mode_button)
+        if self.metrics is not None:
+            details_button = QPushButton(t.translate('details_button'))
+            details_button.clicked.connect(self.show_details)
+            h_box.addWidget(details_button)
+        self.retry_button = QPushButton()
+        self.retry_button.clicked.connect(self.retry_failed_files)
+        h_box.addWidget(self.retry_button)
         h_box.addStretch()
         v_box.addLayout(h_box)
 
         self.replace_layout(v_box)
+        # once it has a parent, otherwise showing it would open it in its own window
+        self.update_retry_button()
 
         window.takeCentralWidget()
         window.setCentralWidget(self)
@@ -413,68 +596,152 @@ class ShowResult(QWidget):
 
     def update_docs_seconds(self, seconds: int):
         self.docs_seconds = seconds * 10
-        self.update_analysis_labels()
+        self.schedule_labels_update('docs_seconds')
 
     def update_vids_multiplier(self, multiplier: int):
         self.vids_multiplier = multiplier / 10
-        self.update_analysis_labels()
+        self.schedule_labels_update('vids_multiplier')
 
     def update_day_hours(self, hours: int):
         self.day_hours = hours
-        self.update_analysis_labels()
-
-    def update_analysis_labels(self):
-        docs_text, vids_text, tot_text, prep_text = "", "", "", ""
-        docs_time, vids_time = 0, 0
+        self.schedule_labels_update('day_hours')
+
+    def schedule_labels_update(self, value: str):
+        self.outdated_labels |= self.slider_labels[value]
+        if not self.label_timer.isActive():
+            self.label_timer.start()
+
+    def update_outdated_labels(self):
+        labels, self.outdated_labels = self.outdated_labels, set()
+        self.update_analysis_labels(labels)
+
+    def breakdown_text(self, study: str) -> str:
+        # what the total of the documents (or of the videos and recordings) is made of, if more than one type of file
+        # adds to it, e.g. "1200 pdf pages and 40 slides"
+        parts = []
+        for analyzer in get_analyzers():
+            value = self.result.get(analyzer.value_field, 0)
+            if analyzer.study != study or not value:
+                continue
+            msg = f'breakdown_{analyzer.file_type}'
+            if msg not in t.translations:  # an analyzer registered by someone else
+                parts.append(f"{value} {analyzer.file_type}")
+            elif study == READ:
+                parts.append(t.plural(msg, value))
+            else:
+                parts.append(t.translate(msg, t.human_readable_time(value)))
+        if len(parts) < 2:
+            return ""
+        return t.translate('breakdown', ", ".join(parts))
+
+    def update_analysis_labels(self, labels: Iterable[str] = ('docs', 'vids', 'tot', 'prep')):
+        study_time = get_study_time(self.result, self.docs_seconds, self.vids_multiplier, self.day_hours)
+        docs_time, vids_time = study_time['docs_time'], study_time['vids_time']
+        material = get_study_material(self.result)
+
+        if 'docs' in labels:
+            docs_text = ""
+            if material['pages'] == 0:
+                # the ending newlines are used to not cut off the QLabel in ShowResult
+                docs_text += t.translate('no_docs')
+                self.docs_slider.setHidden(True)
+                self.docs_slider_label.setHidden(True)
+            else:
+                self.docs_slider.setHidden(False)
+                self.docs_slider_label.setHidden(False)
+                docs_text += t.translate('docs_text',
+                                         material['pages'],
+                                         material['documents'],
+                                         t.human_readable_time(self.docs_seconds),
+                                         t.human_readable_time(docs_time)).replace("\n", "<br>")
+                docs_text += self.breakdown_text(READ).replace("\n", "<br>")
+            if material['documents_error']:
+                docs_text += t.translate('docs_error')
+            # add HTML space after comma so that UI displays correctly
+            self.analysis_docs.setText(docs_text.replace(", ", ",&nbsp;"))
+
+        if 'vids' in labels:
+            vids_text = ""
+            if material['seconds'] == 0:
+                vids_text += t.translate('no_videos')
+                self.vids_slider.setHidden(True)
+                self.vids_slider_label.setHidden(True)
+            else:
+                self.vids_slider.setHidden(False)
+                self.vids_slider_label.setHidden(False)
+                vids_text += t.translate('vids_text',
+                                         t.human_readable_time(material['seconds']),
+                                         material['recordings'],
+                                         self.vids_multiplier,
+                                         t.human_readable_time(vids_time)).replace("\n", "<br>")
+                vids_text += self.breakdown_text(PLAY).replace("\n", "<br>")
+            if material['recordings_error']:
+                vids_text += t.translate('vids_error')
+            self.analysis_vids.setText(vids_text.replace(", ", ",&nbsp;"))
+
+        if 'tot' in labels:
+            if material['pages'] > 0 and material['seconds'] > 0:
+                tot_text = t.translate('tot_text',
+                                       t.human_readable_time(study_time['total_time'])).replace("\n", "<br>")
+                self.analysis_tot.setText(tot_text.replace(", ", ",&nbsp;"))
+            else:
+                self.analysis_tot.setText("")
 
-        if self.result['pdf_pages'] == 0:
-            # the ending newlines are used to not cut off the QLabel in ShowResult
-            docs_text += t.translate('no_docs')
-            self.docs_slider.setHidden(True)
-            self.docs_slider_label.setHidden(True)
-        else:
-            docs_time = self.docs_seconds * self.result['pdf_pages']
-            docs_text += t.translate('docs_text',
-                                     self.result['pdf_pages'],
-                                     self.result['pdf_documents'],
-                                     t.human_readable_time(self.docs_seconds),
-                                     t.human_readable_time(docs_time)).replace("\n", "<br>")
-        if self.result['pdf_error']:
-            docs_text += t.translate('pdf_error')
-
-        if self.result['video_seconds'] == 0:
-            vids_text += t.translate('no_videos')
-            self.vids_slider.setHidden(True)
-            self.vids_slider_label.setHidden(True)
-        else:
-            vids_time = self.result['video_seconds'] / self.vids_multiplier
-            vids_text += t.translate('vids_text',
-                                     t.human_readable_time(self.result['video_seconds']),
-                                     self.result['videos'],
-                                     self.vids_multiplier,
-                                     t.human_readable_time(vids_time)).replace("\n", "<br>")
-        if self.result['video_error']:
-            vids_text += t.translate('video_error')
-
-        # add HTML space after comma so that UI displays correctly
-        self.analysis_docs.setText(docs_text.replace(", ", ",&nbsp;"))
-        self.analysis_vids.setText(vids_text.replace(", ", ",&nbsp;"))
-
-        if self.result['pdf_pages'] > 0 and self.result['video_seconds'] > 0:
-            tot_text += t.translate('tot_text',
-                                    t.human_readable_time(docs_time + vids_time)).replace("\n", "<br>")
-            self.analysis_tot.setText(tot_text.replace(", ", ",&nbsp;"))
-
-        prep_text = t.translate('prep_text',
-                                t.get_hours(self.day_hours),
-                                t.get_days(ceil((docs_time + vids_time) / 3600 / self.day_hours))).replace("\n", "<br>")
-        self.analysis_prep.setText(prep_text.replace(", ", ",&nbsp;"))
+        if 'prep' in labels:
+            prep_text = t.translate('prep_text',
+                                    t.get_hours(self.day_hours),
+                                    t.get_days(study_time['days'])).replace("\n", "<br>")
+            self.analysis_prep.setText(prep_text.replace(", ", ",&nbsp;"))
 
     def click_directory_button(self):
         save_slider_preferences(self)
         show_file_dialog()
 
 
+class DetailsDialog(QDialog):
+    # the files that took longest to analyse and how long the others took, to find what slows an analysis down
+    def __init__(self, metrics: dict, parent: QWidget = None):
+        super().__init__(parent)
+        self.setWindowTitle(t.translate('details_button'))
+
+        files = metrics['cache_hits'] + sum(metrics['files_parsed'].values())
+        text = t.translate('details_text', files, metrics['wall_time'], metrics['cache_hits'])
+        if metrics['slowest_files']:
+            text += t.translate('slowest_files')
+            for file in metrics['slowest_files']:
+                text += f"\n{file['seconds']:.3f} s&nbsp;&nbsp;{escape(file['path'])}"
+            text += "\n\n" + t.translate('parse_time_histogram')
+            histogram = metrics['latency_histogram']
+            most_files = max(bucket['files'] for bucket in histogram)
+            last_bound = histogram[-2]['le_ms']
+            # hide the empty buckets of the slowest files
+            while not histogram[-1]['files']:
+                histogram = histogram[:-1]
+            for bucket in histogram:
+                bound = f"≤ {bucket['le_ms']} ms" if bucket['le_ms'] is not None else f"> {last_bound} ms"
+                bar = "█" * round(20 * bucket['files'] / most_files)
+                text += f"\n{bound}: {bar} {bucket['files']}"
+
+        label = QLabel(text.replace("\n", "<br>"))
+        label.setTextInteractionFlags(Qt.TextSelectableByMouse)  # to copy the paths
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+
+        v_box = QVBoxLayout()
+        v_box.addWidget(label)
+        v_box.addWidget(buttons)
+        self.setLayout(v_box)
+
+
+def _cancel_thread(thread: QThread, wait: bool):
+    thread.cancel()
+    _cancelled_threads.add(thread)
+    thread.finished.connect(lambda: _cancelled_threads.discard(thread))
+    if wait:
+        # only the files already being parsed are left, so this is bounded by the slowest of them
+        thread.wait(ANALYSER_STOP_TIMEOUT_MS)
+
+
 def save_slider_preferences(widget: ShowResult):
     set_preference(Preference.docs_seconds.value,
                    PreferenceDefault.docs_seconds.value,
@@ -516,6 +783,25 @@ def toggle_dark_mode():
 
 
 def main():
+    # parse PDFs and videos in separate processes to use all cores, either with --processes or from the preferences
+    use_processes = "--processes" in argv or get_preference(Preference.process_pool,
+                                                            PreferenceDefault.process_pool,
+                                                            lambda data: Preference.process_pool.value in data
+                                                            and isinstance(data[Preference.process_pool.value], bool))
+    if "--processes" in argv:
+        argv.remove("--processes")
+    worker_pool.configure(use_processes=use_processes)
+    # profile every analysis and dump the stats in the profiles directory under DB_PATH
+    if "--profile" in argv:
+        argv.remove("--profile")
+        Analyser.profile = True
+    # update the result while the analysed files change, either with --watch or from the preferences
+    ShowResult.watch_files = "--watch" in argv or get_preference(Preference.watch_files,
+                                                                 PreferenceDefault.watch_files,
+                                                                 lambda data: Preference.watch_files.value in data
+                                                                 and isinstance(data[Preference.watch_files.value], bool))
+    if "--watch" in argv:
+        argv.remove("--watch")
     global t
     t = Translator()
     global app
@@ -534,6 +820,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # must come first so that worker processes spawned by the PyInstaller bundle do not start another window
+    freeze_support()
     # redirect GTK warnings to logfile instead of the console
     if platform.startswith("linux"):
         Path.mkdir(DB_PATH, exist_ok=True)
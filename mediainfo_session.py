@@ -0,0 +1,58 @@
+import ctypes
+import os
+from threading import local
+
+from pymediainfo import MediaInfo
+
+# see https://github.com/MediaArea/MediaInfoLib/blob/master/Source/MediaInfoDLL/MediaInfoDLL.h
+_STREAM_GENERAL = 0
+_INFO_TEXT = 1
+_INFO_NAME = 0
+
+
+class MediaInfoSession:
+    # long-lived libmediainfo handle that only asks for the duration of the general track:
+    # MediaInfo.parse loads the library, creates a handle and builds the full XML report for every single file
+    def __init__(self):
+        # same lookup as MediaInfo.parse, so that the library bundled by PyInstaller is found as well
+        # (_get_library is private, pymediainfo is pinned in requirements.txt)
+        self._lib, self._handle = MediaInfo._get_library()[:2]
+        self._lib.MediaInfo_Get.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_size_t, ctypes.c_wchar_p,
+                                            ctypes.c_int, ctypes.c_int]
+        self._lib.MediaInfo_Get.restype = ctypes.c_wchar_p
+        # only read what is needed to find the duration, instead of scanning the whole file
+        self._lib.MediaInfo_Option(self._handle, "ParseSpeed", "0")
+        # do not look for image sequences next to the file
+        self._lib.MediaInfo_Option(self._handle, "File_TestContinuousFileNames", "0")
+
+    def get_duration(self, path: str) -> float:
+        # return the duration of the file in milliseconds, as found in the general track
+        path = os.fspath(path)
+        if self._lib.MediaInfo_Open(self._handle, path) == 0:
+            self._lib.MediaInfo_Close(self._handle)
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            raise RuntimeError(f"An error occured while opening {path} with libmediainfo")
+        try:
+            duration = self._lib.MediaInfo_Get(self._handle, _STREAM_GENERAL, 0, "Duration", _INFO_TEXT, _INFO_NAME)
+        finally:
+            self._lib.MediaInfo_Close(self._handle)
+        if not duration:
+            raise RuntimeError(f"No duration found in {path}")
+        return float(duration)
+
+    def __del__(self):
+        handle, self._handle = getattr(self, '_handle', None), None
+        if handle is not None:
+            self._lib.MediaInfo_Delete(handle)
+
+
+# handles must not be shared between threads, so every worker thread (or process) gets its own
+_sessions = local()
+
+
+def get_duration(path: str) -> float:
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = _sessions.session = MediaInfoSession()
+    return session.get_duration(path)
@@ -0,0 +1,139 @@
+import heapq
+import json
+import os
+from bisect import bisect_left
+from itertools import count
+from time import perf_counter, time
+from typing import List, Optional, Tuple
+
+# set to a file (or an existing directory) to write a Chrome trace of every analysis,
+# to be opened with chrome://tracing or https://ui.perfetto.dev
+TRACE_ENV = "STUDY_PLANNER_TRACE"
+
+# (path, start, duration, bytes read, fallback used, process id, thread id) of a file parsed by a worker,
+# start is a perf_counter() value, which is comparable between the processes of the pool
+ParseStats = Tuple[str, float, float, int, bool, int, int]
+
+SLOWEST_FILES = 10
+# upper bounds of the buckets of the parse time histogram, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class AnalysisMetrics:
+    # where the time of an analysis goes, filled by the thread running the analysis while it consumes the results
+    def __init__(self):
+        self.entries_walked = 0
+        self.files_classified = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_read = 0  # only what the header readers read, files handed to PyPDF2 or MediaInfo are not counted
+        self.files_parsed = {}  # file type -> number of files
+        self.parse_time = {}  # file type -> seconds
+        self.fallbacks = {}  # file type -> files the header readers could not handle
+        self.workers = 0
+        self.walk_time = 0.
+        self.wall_time = 0.
+        self.trace_events = None  # one per file parsed, only kept when a trace is written, see start()
+        # min-heap of (seconds, path, file type, bytes read, fallback) of the slowest files parsed so far
+        self._slowest = []
+        # files parsed in each bucket of LATENCY_BUCKETS_MS, the last one is for the slower files
+        self._latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._start = None
+
+    def start(self, workers: int, trace: bool = False):
+        self.workers = workers
+        self.trace_events = [] if trace else None
+        self._start = perf_counter()
+
+    def walk_done(self):
+        self.walk_time = perf_counter() - self._start
+
+    def add_walked(self, entries: int, classified: int):
+        self.entries_walked += entries
+        self.files_classified += classified
+
+    def add_parsed(self, file_type: str, stats: ParseStats):
+        path, start, duration, bytes_read, fallback, pid, tid = stats
+        self.files_parsed[file_type] = self.files_parsed.get(file_type, 0) + 1
+        self.parse_time[file_type] = self.parse_time.get(file_type, 0.) + duration
+        self.fallbacks[file_type] = self.fallbacks.get(file_type, 0) + fallback
+        self.bytes_read += bytes_read
+        entry = (duration, path, file_type, bytes_read, fallback)
+        if len(self._slowest) < SLOWEST_FILES:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+        self._latency_counts[bisect_left(LATENCY_BUCKETS_MS, duration * 1000)] += 1
+        if self.trace_events is None:
+            return
+        self.trace_events.append({
+            'name': os.path.basename(path),
+            'cat': file_type,
+            'ph': "X",
+            'ts': (start - self._start) * 1e6,
+            'dur': duration * 1e6,
+            'pid': pid,
+            'tid': tid,
+            'args': {'path': path, 'bytes_read': bytes_read, 'fallback': fallback},
+        })
+
+    def finish(self):
+        self.wall_time = perf_counter() - self._start
+
+    @property
+    def worker_utilization(self) -> Optional[float]:
+        # fraction of the time the workers of the pool spent parsing, during the whole analysis
+        if not self.wall_time or not self.workers:
+            return None
+        return sum(self.parse_time.values()) / (self.wall_time * self.workers)
+
+    def slowest_files(self) -> List[dict]:
+        return [{'path': path, 'file_type': file_type, 'seconds': duration, 'bytes_read': bytes_read,
+                 'fallback': fallback}
+                for duration, path, file_type, bytes_read, fallback in sorted(self._slowest, reverse=True)]
+
+    def latency_histogram(self) -> List[dict]:
+        # 'le_ms' is None for the files slower than the last bucket
+        bounds = LATENCY_BUCKETS_MS + (None,)
+        return [{'le_ms': bound, 'files': files} for bound, files in zip(bounds, self._latency_counts)]
+
+    def to_dict(self) -> dict:
+        return {
+            'entries_walked': self.entries_walked,
+            'files_classified': self.files_classified,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'bytes_read': self.bytes_read,
+            'files_parsed': dict(self.files_parsed),
+            'parse_time': dict(self.parse_time),
+            'fallbacks': dict(self.fallbacks),
+            'workers': self.workers,
+            'worker_utilization': self.worker_utilization,
+            'walk_time': self.walk_time,
+            'wall_time': self.wall_time,
+            'slowest_files': self.slowest_files(),
+            'latency_histogram': self.latency_histogram(),
+        }
+
+    def write_trace(self, path: str):
+        pid = os.getpid()
+        # phases run by the thread that walks the tree and reads the cache
+        events = [
+            {'name': "analysis", 'cat': "phase", 'ph': "X", 'ts': 0, 'dur': self.wall_time * 1e6, 'pid': pid, 'tid': 0},
+            {'name': "walk", 'cat': "phase", 'ph': "X", 'ts': 0, 'dur': self.walk_time * 1e6, 'pid': pid, 'tid': 0},
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events + (self.trace_events or []), 'otherData': self.to_dict()}, f)
+
+
+_trace_numbers = count()
+
+
+def get_trace_file() -> Optional[str]:
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    if os.path.isdir(path):
+        # one file per analysis, so that the traces of the same session do not overwrite each other
+        return os.path.join(path, f"study_planner_trace_{int(time())}_{os.getpid()}_{next(_trace_numbers)}.json")
+    return path
@@ -0,0 +1,491 @@
+import mmap
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple, Union
+
+from file_io import map_file
+
+# read the page count of a PDF straight from its cross-reference data and page tree root, without parsing the
+# whole document: startxref -> xref table or stream -> trailer /Root -> catalog /Pages -> /Count
+# see https://www.adobe.com/content/dam/acom/en/devnet/pdf/pdfs/PDF32000_2008.pdf sections 7.5 and 7.7.3
+
+_WHITESPACE = b"\x00\t\n\x0c\r "
+_DELIMITERS = b"()<>[]{}/%"
+_XREF_ENTRY = re.compile(rb"(\d{10})[ ](\d{5})[ ]([nf])")
+# appended to data that is known to be complete, so that the lexer never needs to look past its end
+_END = b" endobj "
+_MAX_DEPTH = 32  # limit on nested or chained references, to stop on reference loops in damaged files
+
+
+class PdfPageCountError(Exception):
+    # the file is damaged, encrypted or uses features this reader does not handle: use a full PDF parser instead
+    pass
+
+
+class _EndOfData(Exception):
+    pass
+
+
+class Ref:
+    __slots__ = ('num', 'gen')
+
+    def __init__(self, num: int, gen: int):
+        self.num = num
+        self.gen = gen
+
+
+class _Keyword(str):
+    pass
+
+
+class _Lexer:
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def _byte(self, pos: int) -> int:
+        if pos >= len(self.data):
+            raise _EndOfData
+        return self.data[pos]
+
+    def skip_whitespace(self):
+        while True:
+            c = self._byte(self.pos)
+            if c in _WHITESPACE:
+                self.pos += 1
+            elif c == ord('%'):  # comment until the end of the line
+                while self._byte(self.pos) not in b"\r\n":
+                    self.pos += 1
+            else:
+                return
+
+    def _token(self) -> bytes:
+        start = self.pos
+        while self.pos < len(self.data) and self.data[self.pos] not in _WHITESPACE + _DELIMITERS:
+            self.pos += 1
+        if self.pos >= len(self.data):  # the token might continue after the end of the data read so far
+            raise _EndOfData
+        return self.data[start:self.pos]
+
+    def parse(self):
+        self.skip_whitespace()
+        c = self._byte(self.pos)
+        if c == ord('<') and self._byte(self.pos + 1) == ord('<'):
+            self.pos += 2
+            return self._parse_dict()
+        if c == ord('<'):
+            end = self.data.find(b">", self.pos)
+            if end < 0:
+                raise _EndOfData
+            value = self.data[self.pos + 1:end]
+            self.pos = end + 1
+            return value
+        if c == ord('['):
+            self.pos += 1
+            return self._parse_array()
+        if c == ord('('):
+            return self._parse_string()
+        if c == ord('/'):
+            self.pos += 1
+            return '/' + self._token().decode('latin-1')
+        if c in b"+-.0123456789":
+            return self._parse_number_or_ref()
+        if c in b")>]}{":
+            raise PdfPageCountError(f"unexpected delimiter {chr(c)!r}")
+        return _Keyword(self._token().decode('latin-1'))
+
+    def _parse_dict(self) -> dict:
+        result = {}
+        while True:
+            self.skip_whitespace()
+            if self._byte(self.pos) == ord('>') and self._byte(self.pos + 1) == ord('>'):
+                self.pos += 2
+                return result
+            key = self.parse()
+            if not isinstance(key, str) or not key.startswith('/'):
+                raise PdfPageCountError("dictionary key is not a name")
+            result[key] = self.parse()
+
+    def _parse_array(self) -> list:
+        result = []
+        while True:
+            self.skip_whitespace()
+            if self._byte(self.pos) == ord(']'):
+                self.pos += 1
+                return result
+            result.append(self.parse())
+
+    def _parse_string(self) -> bytes:
+        start, depth = self.pos, 0
+        while True:
+            c = self._byte(self.pos)
+            if c == ord('\\'):
+                self.pos += 2
+                continue
+            if c == ord('('):
+                depth += 1
+            elif c == ord(')'):
+                depth -= 1
+                if depth == 0:
+                    self.pos += 1
+                    return self.data[start + 1:self.pos - 1]
+            self.pos += 1
+
+    def _parse_number(self):
+        token = self._token()
+        try:
+            return int(token)
+        except ValueError:
+            try:
+                return float(token)
+            except ValueError:
+                raise PdfPageCountError(f"invalid number {token!r}")
+
+    def _parse_number_or_ref(self):
+        number = self._parse_number()
+        if not isinstance(number, int) or number < 0:
+            return number
+        # "num gen R" is a reference, otherwise just return the number and leave the rest for the next call
+        start = self.pos
+        try:
+            self.skip_whitespace()
+            if self._byte(self.pos) not in b"0123456789":
+                self.pos = start
+                return number
+            gen = self._parse_number()
+            self.skip_whitespace()
+            if self._byte(self.pos) == ord('R') and self._byte(self.pos + 1) in _WHITESPACE + _DELIMITERS:
+                self.pos += 1
+                return Ref(number, gen)
+        except PdfPageCountError:
+            pass
+        self.pos = start
+        return number
+
+
+class _XrefSection:
+    # lookup returns (1, offset) for objects stored in the file, (2, object stream number, index) for objects
+    # stored in an object stream, (0,) for free objects and None for objects not listed in this section
+    def __init__(self, trailer: dict):
+        self.trailer = trailer
+
+    def lookup(self, num: int) -> Optional[tuple]:
+        raise NotImplementedError
+
+
+class _XrefTable(_XrefSection):
+    def __init__(self, reader: '_PdfReader', trailer: dict, subsections: List[Tuple[int, int, int]]):
+        super().__init__(trailer)
+        self.reader = reader
+        self.subsections = subsections  # (first object number, number of objects, offset of the first entry)
+
+    def lookup(self, num: int) -> Optional[tuple]:
+        for first, count, offset in self.subsections:
+            if first <= num < first + count:
+                # every entry is exactly 20 bytes long, so the one we need can be read directly
+                match = _XREF_ENTRY.match(self.reader.read(offset + 20 * (num - first), 18))
+                if not match:
+                    raise PdfPageCountError(f"malformed xref entry for object {num}")
+                if match.group(3) == b"f":
+                    return 0,
+                return 1, int(match.group(1))
+        return None
+
+
+class _XrefStream(_XrefSection):
+    def __init__(self, trailer: dict, data: bytes):
+        super().__init__(trailer)
+        self.widths = trailer.get('/W')
+        if not isinstance(self.widths, list) or len(self.widths) != 3 \
+                or not all(isinstance(w, int) and w >= 0 for w in self.widths):
+            raise PdfPageCountError("invalid /W in xref stream")
+        index = trailer.get('/Index', [0, trailer.get('/Size', 0)])
+        if not isinstance(index, list) or len(index) % 2 or not all(isinstance(i, int) for i in index):
+            raise PdfPageCountError("invalid /Index in xref stream")
+        self.index = [(index[i], index[i + 1]) for i in range(0, len(index), 2)]
+        self.data = data
+
+    def lookup(self, num: int) -> Optional[tuple]:
+        entry_size = sum(self.widths)
+        position = 0
+        for first, count in self.index:
+            if first <= num < first + count:
+                start = (position + num - first) * entry_size
+                entry = self.data[start:start + entry_size]
+                if len(entry) < entry_size:
+                    raise PdfPageCountError(f"truncated xref stream entry for object {num}")
+                fields, offset = [], 0
+                for width in self.widths:
+                    fields.append(int.from_bytes(entry[offset:offset + width], 'big'))
+                    offset += width
+                entry_type = fields[0] if self.widths[0] else 1
+                if entry_type == 1:
+                    return 1, fields[1]
+                if entry_type == 2:
+                    return 2, fields[1], fields[2]
+                return 0,
+            position += count
+        return None
+
+
+def _unpredict(data: bytes, params: dict) -> bytes:
+    # undo the PNG predictors commonly applied to xref and object streams
+    predictor = params.get('/Predictor', 1)
+    if predictor == 1:
+        return data
+    if predictor < 10:
+        raise PdfPageCountError(f"unsupported predictor {predictor}")
+    colors = params.get('/Colors', 1)
+    bits = params.get('/BitsPerComponent', 8)
+    columns = params.get('/Columns', 1)
+    bpp = max(1, colors * bits // 8)
+    row_length = (columns * colors * bits + 7) // 8
+    result = bytearray()
+    previous = bytearray(row_length)
+    for start in range(0, len(data), row_length + 1):
+        png_filter = data[start]
+        row = bytearray(data[start + 1:start + 1 + row_length])
+        for i in range(len(row)):
+            left = row[i - bpp] if i >= bpp else 0
+            up = previous[i]
+            if png_filter == 1:
+                row[i] = (row[i] + left) & 0xff
+            elif png_filter == 2:
+                row[i] = (row[i] + up) & 0xff
+            elif png_filter == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xff
+            elif png_filter == 4:
+                up_left = previous[i - bpp] if i >= bpp else 0
+                p = left + up - up_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+                row[i] = (row[i] + (left if pa <= pb and pa <= pc else up if pb <= pc else up_left)) & 0xff
+            elif png_filter != 0:
+                raise PdfPageCountError(f"unsupported PNG filter {png_filter}")
+        result += row
+        previous = row
+    return bytes(result)
+
+
+class _PdfReader:
+    def __init__(self, data: Union[mmap.mmap, bytes]):
+        self.data = data
+        self._ranges = []  # (start, end) of every read, windows can overlap when objects are close to each other
+        self.sections = []
+        self._object_streams = {}  # object stream number -> (decompressed data, {object number: offset})
+
+    def read(self, offset: int, size: int) -> bytes:
+        chunk = self.data[offset:offset + size]
+        self._ranges.append((offset, offset + len(chunk)))
+        return chunk
+
+    @property
+    def bytes_read(self) -> int:
+        # count every byte of the file once, no matter how many times it was read
+        total, end = 0, 0
+        for start, stop in sorted(self._ranges):
+            total += max(0, stop - max(start, end))
+            end = max(end, stop)
+        return total
+
+    def _parse_at(self, offset: int, parse, size: int = 512):
+        # parse from a small window first and only read more when the object does not fit
+        while True:
+            chunk = self.read(offset, size)
+            try:
+                return parse(_Lexer(chunk))
+            except _EndOfData:
+                if offset + size >= len(self.data):
+                    raise PdfPageCountError(f"unexpected end of file at offset {offset}")
+                size *= 4
+
+    def _find_startxref(self) -> int:
+        tail_size = min(len(self.data), 1024)
+        tail = self.read(len(self.data) - tail_size, tail_size)
+        position = tail.rfind(b"startxref")
+        if position < 0:
+            raise PdfPageCountError("startxref not found")
+        match = re.match(rb"startxref\s+(\d+)", tail[position:])
+        if not match:
+            raise PdfPageCountError("invalid startxref")
+        return int(match.group(1))
+
+    def load_xref(self):
+        offset, seen = self._find_startxref(), set()
+        while offset is not None:
+            if offset in seen or len(seen) > _MAX_DEPTH:
+                raise PdfPageCountError("loop in the xref chain")
+            seen.add(offset)
+            section = self._load_section(offset)
+            self.sections.append(section)
+            # hybrid files keep the objects added by an update in a separate xref stream
+            xref_stream = section.trailer.get('/XRefStm')
+            if isinstance(xref_stream, int) and isinstance(section, _XrefTable):
+                self.sections.append(self._load_section(xref_stream))
+            previous = section.trailer.get('/Prev')
+            offset = previous if isinstance(previous, int) else None
+        if any('/Encrypt' in section.trailer for section in self.sections):
+            raise PdfPageCountError("encrypted file")
+
+    def _load_section(self, offset: int) -> _XrefSection:
+        if offset >= len(self.data):
+            raise PdfPageCountError("xref offset out of the file")
+        if self.read(offset, 4) == b"xref":
+            return self._load_table(offset + 4)
+        _, obj, stream = self._load_object_at(offset)
+        if not isinstance(obj, dict) or obj.get('/Type') != '/XRef' or stream is None:
+            raise PdfPageCountError("invalid xref stream")
+        return _XrefStream(obj, stream)
+
+    def _load_table(self, offset: int) -> _XrefTable:
+        subsections = []
+
+        def parse_header(lexer: _Lexer):
+            lexer.skip_whitespace()
+            token = lexer.parse()
+            if token == 'trailer':
+                return None, lexer.parse(), lexer.pos
+            count = lexer.parse()
+            if not isinstance(token, int) or not isinstance(count, int):
+                raise PdfPageCountError("invalid xref subsection header")
+            lexer.skip_whitespace()
+            return (token, count), None, lexer.pos
+
+        while True:
+            header, trailer, consumed = self._parse_at(offset, parse_header)
+            if header is None:
+                if not isinstance(trailer, dict):
+                    raise PdfPageCountError("invalid trailer")
+                return _XrefTable(self, trailer, subsections)
+            first, count = header
+            entries = offset + consumed
+            subsections.append((first, count, entries))
+            # skip the entries without reading them
+            offset = entries + 20 * count
+
+    def _load_object_at(self, offset: int) -> Tuple[int, object, Optional[bytes]]:
+        def parse(lexer: _Lexer):
+            num, gen, keyword = lexer.parse(), lexer.parse(), lexer.parse()
+            if not isinstance(num, int) or not isinstance(gen, int) or keyword != 'obj':
+                raise PdfPageCountError(f"no object at offset {offset}")
+            obj = lexer.parse()
+            lexer.skip_whitespace()
+            if lexer.pos + len(b"stream") >= len(lexer.data):  # not enough data to tell if a stream follows
+                raise _EndOfData
+            is_stream = lexer.data.startswith(b"stream", lexer.pos)
+            if is_stream:
+                lexer.pos += len(b"stream")
+                # the keyword is followed by CRLF or LF, then the stream data
+                if lexer._byte(lexer.pos) == ord('\r'):
+                    lexer.pos += 1
+                if lexer._byte(lexer.pos) == ord('\n'):
+                    lexer.pos += 1
+            return num, obj, is_stream, lexer.pos
+
+        num, obj, is_stream, consumed = self._parse_at(offset, parse)
+        if not is_stream:
+            return num, obj, None
+        if not isinstance(obj, dict):
+            raise PdfPageCountError("stream without a dictionary")
+        length = self.resolve(obj.get('/Length'))
+        if not isinstance(length, int) or length < 0:
+            raise PdfPageCountError("invalid stream length")
+        return num, obj, self._decode(obj, self.read(offset + consumed, length))
+
+    def _decode(self, obj: dict, data: bytes) -> bytes:
+        filters = obj.get('/Filter', [])
+        params = obj.get('/DecodeParms', {})
+        if not isinstance(filters, list):
+            filters, params = [filters], [params]
+        elif not isinstance(params, list):
+            params = [params]
+        for i, name in enumerate(filters):
+            if name != '/FlateDecode':
+                raise PdfPageCountError(f"unsupported filter {name}")
+            try:
+                data = zlib.decompress(data)
+            except zlib.error as e:
+                raise PdfPageCountError(f"invalid compressed stream: {e}")
+            param = params[i] if i < len(params) else None
+            if isinstance(param, dict):
+                data = _unpredict(data, param)
+        return data
+
+    def _lookup(self, num: int) -> Optional[tuple]:
+        # newer sections come first and override the older ones
+        for section in self.sections:
+            entry = section.lookup(num)
+            if entry is not None:
+                return entry
+        return None
+
+    def _load_object_stream(self, num: int) -> Tuple[bytes, Dict[int, int]]:
+        if num not in self._object_streams:
+            obj, data = self.get_object(num, with_stream=True)
+            if not isinstance(obj, dict) or data is None:
+                raise PdfPageCountError(f"object {num} is not an object stream")
+            count, first = obj.get('/N'), obj.get('/First')
+            if not isinstance(count, int) or not isinstance(first, int):
+                raise PdfPageCountError(f"invalid object stream {num}")
+            lexer, offsets = _Lexer(data[:first] + _END), {}
+            try:
+                for _ in range(count):
+                    obj_num = lexer.parse()
+                    offsets[obj_num] = first + lexer.parse()
+            except _EndOfData:
+                raise PdfPageCountError(f"truncated object stream {num}")
+            self._object_streams[num] = data, offsets
+        return self._object_streams[num]
+
+    def get_object(self, num: int, with_stream: bool = False):
+        entry = self._lookup(num)
+        if entry is None or entry[0] == 0:
+            raise PdfPageCountError(f"object {num} not found")
+        if entry[0] == 1:
+            found, obj, stream = self._load_object_at(entry[1])
+            if found != num:
+                raise PdfPageCountError(f"xref offset of object {num} points to object {found}")
+            return (obj, stream) if with_stream else obj
+        if with_stream:
+            raise PdfPageCountError(f"stream {num} inside an object stream")
+        data, offsets = self._load_object_stream(entry[1])
+        if num not in offsets:
+            raise PdfPageCountError(f"object {num} missing from object stream {entry[1]}")
+        try:
+            return _Lexer(data + _END, offsets[num]).parse()
+        except _EndOfData:
+            raise PdfPageCountError(f"truncated object {num}")
+
+    def resolve(self, obj, depth: int = 0):
+        while isinstance(obj, Ref):
+            if depth > _MAX_DEPTH:
+                raise PdfPageCountError("too many nested references")
+            obj = self.get_object(obj.num)
+            depth += 1
+        return obj
+
+    def count_pages(self) -> int:
+        self.load_xref()
+        root = next((s.trailer['/Root'] for s in self.sections if '/Root' in s.trailer), None)
+        catalog = self.resolve(root)
+        if not isinstance(catalog, dict):
+            raise PdfPageCountError("invalid document catalog")
+        pages = self.resolve(catalog.get('/Pages'))
+        if not isinstance(pages, dict):
+            raise PdfPageCountError("invalid page tree root")
+        count = self.resolve(pages.get('/Count'))
+        if not isinstance(count, int) or count < 0:
+            raise PdfPageCountError("invalid page count")
+        return count
+
+
+def count_pdf_pages(path: str) -> Tuple[int, int]:
+    # return the number of pages and the number of bytes actually read to find it,
+    # raise PdfPageCountError if the file cannot be handled without a full PDF parser
+    with map_file(path) as data:
+        if not data:
+            raise PdfPageCountError("empty file")
+        reader = _PdfReader(data)
+        try:
+            return reader.count_pages(), reader.bytes_read
+        except (_EndOfData, IndexError, KeyError, TypeError, ValueError, RecursionError) as e:
+            raise PdfPageCountError(f"damaged file: {e!r}")
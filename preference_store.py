@@ -0,0 +1,97 @@
+import atexit
+import json
+import os
+from contextlib import contextmanager
+from json import JSONDecodeError
+from pathlib import Path
+from threading import Lock, Timer
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def _locked(lock_file: str):
+    # exclusive lock shared with the other instances of the app, held while the preferences file is merged and replaced
+    with open(lock_file, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PreferenceStore:
+    # preferences read from db_file once per process and kept in memory; changes are written behind,
+    # debounce seconds after the last one or when flush() is called, by merging them into what is on disk,
+    # so that two instances of the app sharing the file only overwrite the preferences they changed
+    def __init__(self, db_file: str, debounce: float = 1.):
+        self.db_file = db_file
+        self.debounce = debounce
+        self._data = None
+        self._changes = {}
+        self._timer = None
+        self._lock = Lock()
+        atexit.register(self.flush)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.db_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, JSONDecodeError):  # missing or corrupted file, start from the defaults
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    @property
+    def data(self) -> dict:
+        with self._lock:
+            if self._data is None:
+                self._data = self._read()
+            return self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            if self._data is None:
+                self._data = self._read()
+            self._data[key] = value
+            self._changes[key] = value
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._changes:
+                return
+            Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+            with _locked(f"{self.db_file}.lock"):
+                # keep what other instances wrote in the meantime
+                data = self._read()
+                data.update(self._changes)
+                # write to a temporary file first so that a crash never leaves a truncated file behind
+                tmp_file = f"{self.db_file}.{os.getpid()}.tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_file, self.db_file)
+            self._data = data
+            self._changes = {}
@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+from json import JSONDecodeError
+from pathlib import Path
+from threading import Lock, Thread
+from time import monotonic, time
+from typing import Optional, Tuple
+
+RELEASES_URL = "https://api.github.com/repos/e-caste/study-planner/releases/latest"
+# set to another URL, e.g. of a local server, to check for releases there instead
+RELEASES_URL_ENV = "STUDY_PLANNER_RELEASES_URL"
+# seconds a successful check is reused for, and after which a failed check is tried again
+CHECK_TTL = 24 * 60 * 60
+FAILED_CHECK_TTL = 60 * 60
+# seconds to wait for the connection, and then for every read from it
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5.
+# seconds the whole check may take, however slowly the server sends its response
+TOTAL_TIMEOUT = 10.
+CHUNK_SIZE = 8192
+
+
+class ReleaseChecker:
+    # the tag of the latest release, asked to the releases URL at most once every ttl seconds and persisted
+    # in cache_file together with the ETag of the response, so that expired checks are revalidated with
+    # If-None-Match (answered with an empty 304 that does not count against the GitHub rate limit);
+    # concurrent calls of latest_release() wait for the check in progress instead of starting another one
+    def __init__(self, cache_file: str, url: Optional[str] = None, ttl: float = CHECK_TTL,
+                 failed_ttl: float = FAILED_CHECK_TTL, timeout: tuple = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                 total_timeout: float = TOTAL_TIMEOUT):
+        self.cache_file = cache_file
+        self.url = url or os.environ.get(RELEASES_URL_ENV) or RELEASES_URL
+        self.ttl = ttl
+        self.failed_ttl = failed_ttl
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self._lock = Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, JSONDecodeError):
+            return {}
+        # a check of another URL, e.g. of a local server, says nothing about this one
+        return data if isinstance(data, dict) and data.get('url') == self.url else {}
+
+    def _write(self, data: dict):
+        try:
+            Path(self.cache_file).parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            print(e, file=sys.stderr)
+
+    def _get(self, headers: dict, deadline: float) -> Tuple[int, Optional[str], bytes]:
+        # the status, ETag and body of the response, read in chunks so that a server sending it slowly
+        # (each read within the read timeout) is given up on at the deadline
+        import requests
+        with requests.get(self.url, headers=headers, timeout=self.timeout, stream=True) as res:
+            if res.status_code == 304:
+                return res.status_code, None, b""
+            res.raise_for_status()
+            chunks = []
+            for chunk in res.iter_content(CHUNK_SIZE):
+                if monotonic() > deadline:
+                    raise requests.Timeout(f"No complete response from {self.url} in {self.total_timeout} s")
+                chunks.append(chunk)
+            return res.status_code, res.headers.get('ETag'), b"".join(chunks)
+
+    def _fetch(self, cached: dict) -> dict:
+        # imported here, it takes longer to import than the rest of the app
+        import requests
+        headers = {'Accept': "application/vnd.github+json"}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        data = {'url': self.url, 'checked': time(), 'failed': False,
+                'etag': cached.get('etag'), 'tag_name': cached.get('tag_name')}
+        # the request runs in its own thread so that the check returns at the deadline even while a read is
+        # blocked on a stalled server, the thread stops by itself at the read timeout or at the next chunk
+        deadline = monotonic() + self.total_timeout
+        outcome = {}
+
+        def get():
+            try:
+                outcome['response'] = self._get(headers, deadline)
+            except Exception as e:  # raised again below, in the checking thread
+                outcome['error'] = e
+
+        thread = Thread(target=get, name="release check", daemon=True)
+        thread.start()
+        thread.join(self.total_timeout)
+        try:
+            if thread.is_alive():
+                raise requests.Timeout(f"No complete response from {self.url} in {self.total_timeout} s")
+            if 'error' in outcome:
+                raise outcome['error']
+            status_code, etag, content = outcome['response']
+            if status_code == 304:  # not modified since the cached check
+                return data
+            body = json.loads(content)
+            data['etag'] = etag
+            data['tag_name'] = body.get('tag_name') if isinstance(body, dict) else None
+        except (requests.RequestException, ValueError) as e:  # offline, timed out, rate limited or not JSON
+            print(e, file=sys.stderr)
+            data['failed'] = True
+        return data
+
+    def latest_release(self) -> Optional[str]:
+        with self._lock:
+            cached = self._read()
+            ttl = self.failed_ttl if cached.get('failed') else self.ttl
+            checked = cached.get('checked')
+            if isinstance(checked, (int, float)) and 0 <= time() - checked < ttl:
+                return cached.get('tag_name')
+            data = self._fetch(cached)
+            self._write(data)
+            return data['tag_name']
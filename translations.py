@@ -1,70 +1,139 @@
+import re
+from functools import lru_cache
+from string import Formatter
 from sys import platform, stderr
+from typing import Callable, Dict
 if platform.startswith("darwin"):
     from subprocess import check_output
 else:
     import locale  # this does not work in a Mac app (but works fine in Python on macOS)
 
+DEFAULT_LANGUAGE = "en"
 
-class Translator:
-    def __init__(self):
+# plural category of a number for every family of languages that share the same rule, see
+# https://unicode-org.github.io/cldr-staging/charts/latest/supplemental/language_plural_rules.html
+# (the categories a message has no form for, e.g. 'many' of Italian, fall back to 'other')
+PLURAL_RULES = {
+    'one_other': lambda n: 'one' if n == 1 else 'other',  # e.g. English, Italian, German, Spanish
+    'other': lambda n: 'other',  # e.g. Chinese, Japanese
+}
+# plural rule of every language of the catalog
+LANGUAGE_PLURAL_RULES = {
+    'en': 'one_other',
+    'it': 'one_other',
+}
+
+
+def _detect_language() -> str:
+    try:
         if platform.startswith("darwin"):
-            lang = "it" if "it" in check_output("defaults read -g AppleLanguages".split()).decode('utf-8').split("\n")[1] else "en"
+            # e.g. '    "it-IT",' on the second line, after the opening parenthesis
+            lang = check_output("defaults read -g AppleLanguages".split()).decode('utf-8').split("\n")[1]
+            lang = lang.strip().strip('",')
         else:
-            lang = "it" if "it" in locale.getdefaultlocale()[0] else "en"
-        self.lang = lang
+            lang = locale.getdefaultlocale()[0] or ""
+    except (OSError, IndexError, ValueError) as e:
+        print(f"Could not detect the language: {e}", file=stderr)
+        return DEFAULT_LANGUAGE
+    lang = lang[:2].lower()
+    return lang if lang in LANGUAGE_PLURAL_RULES else DEFAULT_LANGUAGE
+
+
+# format specs of str.format fields that printf-style formatting writes the same way
+_PRINTF_SPEC = re.compile(r"\.\d+f")
+
+
+def _fields(template: str) -> list:
+    return [(field, spec) for _, field, spec, _ in Formatter().parse(template) if field is not None]
+
+
+def _compile(template: str) -> Callable:
+    # a function formatting the template, parsed once here instead of by str.format at every call: the text itself
+    # without fields, a printf-style template with automatically numbered fields, str.format for anything else
+    literals, printf, has_fields = [], [], False
+    for literal, field, spec, conversion in Formatter().parse(template):
+        literals.append(literal)
+        printf.append(literal.replace("%", "%%"))
+        if field is None:
+            continue
+        if field or conversion or (spec and not _PRINTF_SPEC.fullmatch(spec)):
+            return template.format
+        printf.append("%" + (spec or "s"))
+        has_fields = True
+    if not has_fields:
+        text = "".join(literals)
+        return lambda: text
+    printf = "".join(printf)
+    return lambda *args: printf % args
+
+
+def compile_catalog(translations: dict) -> Dict[str, Dict[str, Callable]]:
+    # language -> message -> function formatting it with the arguments of Translator.translate, or
+    # language -> message -> plural category -> the same, for the messages that depend on a number;
+    # templates must have the same fields in every language, so that a wrong translation fails here at startup
+    # rather than when its message is first shown
+    catalog = {lang: {} for lang in LANGUAGE_PLURAL_RULES}
+    for msg, languages in translations.items():
+        default = languages[DEFAULT_LANGUAGE]
+        for lang in catalog:
+            template = languages[lang]
+            if isinstance(template, dict):
+                if 'other' not in template \
+                        or any(_fields(form) != _fields(default['other']) for form in template.values()):
+                    raise ValueError(f"Plural forms of message {msg} in {lang} do not match {DEFAULT_LANGUAGE}")
+                catalog[lang][msg] = {category: _compile(form) for category, form in template.items()}
+            else:
+                if _fields(template) != _fields(default):
+                    raise ValueError(f"Message {msg} in {lang} does not have the same fields as in {DEFAULT_LANGUAGE}")
+                catalog[lang][msg] = _compile(template)
+    return catalog
+
+
+class Translator:
+    def __init__(self, lang: str = None):
+        self.lang = lang or _detect_language()
         print(f"Language detected: {self.lang}")
+        # flat table of the messages in this language only, see compile_catalog()
+        self._messages = compile_catalog(self.translations)[self.lang]
+        self._plural_rule = PLURAL_RULES[LANGUAGE_PLURAL_RULES[self.lang]]
+        # the same durations are formatted over and over while the sliders move; cached per instance, a cache on
+        # the method would be shared by every instance and keep them all alive
+        self.human_readable_time = lru_cache(maxsize=256, typed=True)(self._human_readable_time)
 
     def translate(self, msg: str, *args) -> str:
-        if msg not in self.translations:
+        message = self._messages.get(msg)
+        if message is None:
             raise Exception(f"Message {msg} is not available.")
-        else:
-            return self.translations[msg][self.lang].format(*args)
+        return message(*args)
 
-    def human_readable_time(self, seconds) -> str:
+    def plural(self, msg: str, n) -> str:
+        forms = self._messages[msg]
+        return forms.get(self._plural_rule(n), forms['other'])(n)
+
+    def _human_readable_time(self, seconds) -> str:
         if seconds < 0:
             print("An error occurred due to negative time being calculated. Please try again.", file=stderr)
             exit(-1)
-        elif 0 <= seconds < 60:
-            if seconds == 1:
-                return f"{seconds} second" if self.lang == 'en' else f"{seconds} secondo"
-            else:
-                return f"{seconds} seconds" if self.lang == 'en' else f"{seconds} secondi"
-        elif 60 <= seconds < 3600:
+        elif seconds < 60:
+            return self.plural('seconds', seconds)
+        elif seconds < 3600:
             minutes = int(seconds // 60)
             remainder = int(seconds % 60)
-            if minutes == 1:
-                res = f"{minutes} minute" if self.lang == 'en' else f"{minutes} minuto"
-            else:
-                res = f"{minutes} minutes" if self.lang == 'en' else f"{minutes} minuti"
-            if remainder == 1:
-                res += f" and {remainder} second" if self.lang == 'en' else f" e {remainder} secondo"
-            elif remainder > 1:
-                res += f" and {remainder} seconds" if self.lang == 'en' else f" e {remainder} secondi"
-            return res
-        elif seconds >= 3600:
+            if remainder:
+                return self.translate('time_and', self.plural('minutes', minutes), self.plural('seconds', remainder))
+            return self.plural('minutes', minutes)
+        else:
             hours = int(seconds // 3600)
             minutes = int(seconds % 3600) // 60
-            if hours == 1:
-                res = f"{hours} hour" if self.lang == 'en' else f"{hours} ora"
-            else:
-                res = f"{hours} hours" if self.lang == 'en' else f"{hours} ore"
-            if minutes == 1:
-                res += f" and {minutes} minute" if self.lang == 'en' else f" e {minutes} minuto"
-            elif minutes > 1:
-                res += f" and {minutes} minutes" if self.lang == 'en' else f" e {minutes} minuti"
-            return res
+            if minutes:
+                return self.translate('time_and', self.plural('hours', hours), self.plural('minutes', minutes))
+            return self.plural('hours', hours)
 
     def get_hours(self, hours: int) -> str:
-        if hours == 1:
-            return f"{hours} hour" if self.lang == 'en' else f"{hours} ora"
-        else:
-            return f"{hours} hours" if self.lang == 'en' else f"{hours} ore"
+        return self.plural('hours', hours)
 
     def get_days(self, days: int) -> str:
-        if days == 1:
-            return f"{days} day" if self.lang == 'en' else f"{days} giorno"
-        else:
-            return f"{days} days" if self.lang == 'en' else f"{days} giorni"
+        return self.plural('days', days)
 
     translations = {
         'choose_button': {
@@ -100,8 +169,8 @@ class Translator:
             'en': "Documents",
         },
         'videos': {
-            'it': "Video",
-            'en': "Videos",
+            'it': "Video e audio",
+            'en': "Videos and audio",
         },
         'total': {
             'it': "Totale",
@@ -111,33 +180,78 @@ class Translator:
             'it': "Preparazione",
             'en': "Preparation",
         },
+        'progress_text': {
+            'it': "Analizzati <b>{}</b> file su {} trovati finora: <b>{}</b> pagine da leggere e <b>{}</b> da guardare "
+                  "o ascoltare.",
+            'en': "Analysed <b>{}</b> of the {} files found so far: <b>{}</b> pages to read and <b>{}</b> to watch or "
+                  "listen to.",
+        },
+        'progress_errors': {
+            'it': "\n{} file non si sono aperti correttamente.",
+            'en': "\n{} files could not be opened correctly.",
+        },
+        'progress_eta': {
+            'it': "\nTempo rimanente stimato: <b>{}</b>.",
+            'en': "\nEstimated time left: <b>{}</b>.",
+        },
+        'details_button': {
+            'it': "Dettagli",
+            'en': "Details",
+        },
+        'details_text': {
+            'it': "Analizzati <b>{}</b> file in <b>{:.2f}</b> secondi, di cui {} già in cache.\n\n",
+            'en': "Analysed <b>{}</b> files in <b>{:.2f}</b> seconds, {} of which were already cached.\n\n",
+        },
+        'slowest_files': {
+            'it': "<b>File più lenti da analizzare:</b>",
+            'en': "<b>Slowest files to analyse:</b>",
+        },
+        'parse_time_histogram': {
+            'it': "<b>Tempo di analisi per file:</b>",
+            'en': "<b>Analysis time per file:</b>",
+        },
         'no_docs': {
-            'it': "Sembra che non ci siano pdf da studiare nelle cartelle selezionate.\n",
-            'en': "It seems there are no pdfs to study in the given directories.\n",
+            'it': "Sembra che non ci siano documenti da studiare nelle cartelle selezionate.\n",
+            'en': "It seems there are no documents to study in the given directories.\n",
         },
         'docs_text': {
-            'it': "Ci sono <b>{}</b> pagine di pdf da studiare nelle cartelle selezionate tra <b>{}</b> file.\nA "
+            'it': "Ci sono <b>{}</b> pagine da studiare nelle cartelle selezionate tra <b>{}</b> file.\nA "
                   "<b>{}</b> per pagina, ci impiegherai <b>{}</b> a studiare questi documenti.\n",
-            'en': "There are <b>{}</b> pdf pages to study in the given directories spanning <b>{}</b> files.\nAt "
+            'en': "There are <b>{}</b> pages to study in the given directories spanning <b>{}</b> files.\nAt "
                   "<b>{}</b> per page, it will take you <b>{}</b> to study these documents.\n",
         },
-        'pdf_error': {
-            'it': "\nSembra che alcuni documenti pdf non si siano aperti correttamente, sono stati saltati.\n",
-            'en': "\nIt seems some PDF documents could not be opened correctly, they have been skipped.\n",
+        'docs_error': {
+            'it': "\nSembra che alcuni documenti non si siano aperti correttamente, sono stati saltati.\n",
+            'en': "\nIt seems some documents could not be opened correctly, they have been skipped.\n",
         },
         'no_videos': {
-            'it': "Sembra che non ci siano videolezioni da guardare nelle cartelle selezionate.\n",
-            'en': "It seems there are no video lectures to watch in the given directories.\n",
+            'it': "Sembra che non ci siano videolezioni o registrazioni da guardare o ascoltare nelle cartelle "
+                  "selezionate.\n",
+            'en': "It seems there are no video lectures or recordings to watch or listen to in the given "
+                  "directories.\n",
         },
         'vids_text': {
-            'it': "Ci sono <b>{}</b> da guardare nelle cartelle selezionate divisi tra <b>{}</b> video.\n A <b>{}x</b> "
-                  "ci impiegherai <b>{}</b> a finire.\n",
-            'en': "There are <b>{}</b> to watch in the given directories divided between <b>{}</b> videos.\nAt "
-                  "<b>{}x</b> it will take you <b>{}</b> to finish.\n",
+            'it': "Ci sono <b>{}</b> da guardare o ascoltare nelle cartelle selezionate divisi tra <b>{}</b> file.\n "
+                  "A <b>{}x</b> ci impiegherai <b>{}</b> a finire.\n",
+            'en': "There are <b>{}</b> to watch or listen to in the given directories divided between <b>{}</b> "
+                  "files.\nAt <b>{}x</b> it will take you <b>{}</b> to finish.\n",
+        },
+        'vids_error': {
+            'it': "\nSembra che alcuni video o registrazioni non si siano aperti correttamente, sono stati saltati.\n",
+            'en': "\nIt seems some video or audio files could not be opened correctly, they have been skipped.\n",
+        },
+        # what a total is made of, see ShowResult.breakdown_text(), with a message for every analyzer
+        'breakdown': {
+            'it': "In dettaglio: {}.\n",
+            'en': "In detail: {}.\n",
         },
-        'video_error': {
-            'it': "\nSembra che alcuni video non si siano aperti correttamente, sono stati saltati.\n",
-            'en': "\nIt seems some video files could not be opened correctly, they have been skipped.\n",
+        'breakdown_vid': {
+            'it': "{} di video",
+            'en': "{} of video",
+        },
+        'breakdown_audio': {
+            'it': "{} di audio",
+            'en': "{} of audio",
         },
         'tot_text': {
             'it': "In totale, ci impiegherai <b>{}</b> a studiare tutto tra i file e le cartelle selezionate.\n",
@@ -159,4 +273,41 @@ class Translator:
            'it': "Abilita/disabilita dark mode",
            'en': "Toggle dark mode",
         },
+        # messages that depend on a number, see Translator.plural()
+        'seconds': {
+            'it': {'one': "{} secondo", 'other': "{} secondi"},
+            'en': {'one': "{} second", 'other': "{} seconds"},
+        },
+        'minutes': {
+            'it': {'one': "{} minuto", 'other': "{} minuti"},
+            'en': {'one': "{} minute", 'other': "{} minutes"},
+        },
+        'hours': {
+            'it': {'one': "{} ora", 'other': "{} ore"},
+            'en': {'one': "{} hour", 'other': "{} hours"},
+        },
+        'days': {
+            'it': {'one': "{} giorno", 'other': "{} giorni"},
+            'en': {'one': "{} day", 'other': "{} days"},
+        },
+        'breakdown_doc': {
+            'it': {'one': "{} pagina di pdf", 'other': "{} pagine di pdf"},
+            'en': {'one': "{} pdf page", 'other': "{} pdf pages"},
+        },
+        'breakdown_epub': {
+            'it': {'one': "{} pagina di ebook", 'other': "{} pagine di ebook"},
+            'en': {'one': "{} ebook page", 'other': "{} ebook pages"},
+        },
+        'breakdown_slides': {
+            'it': {'one': "{} slide", 'other': "{} slide"},
+            'en': {'one': "{} slide", 'other': "{} slides"},
+        },
+        'retry_button': {
+            'it': {'one': "Riprova {} file non aperto", 'other': "Riprova {} file non aperti"},
+            'en': {'one': "Retry {} failed file", 'other': "Retry {} failed files"},
+        },
+        'time_and': {
+            'it': "{} e {}",
+            'en': "{} and {}",
+        },
     }
@@ -0,0 +1,416 @@
+import os
+import struct
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from file_io import open_file
+
+# read the duration of a video (or of an audio recording) straight from the header of its container, seeking to
+# the few bytes that hold it instead of letting libmediainfo parse the whole file; every probe returns milliseconds
+# or raises VideoProbeError
+
+_MAX_ELEMENTS = 4096  # give up on files that need too many small reads to reach the duration
+
+
+class VideoProbeError(Exception):
+    # the container is damaged or the duration is not in its header: use MediaInfo instead
+    pass
+
+
+def _read_exactly(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise VideoProbeError("unexpected end of file")
+    return data
+
+
+# MP4 and MOV, see ISO/IEC 14496-12 section 4.2 (boxes) and 8.2.2 (mvhd)
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    # yield (type, payload offset, end offset) of every box between start and end
+    offset, count = start, 0
+    while offset + 8 <= end:
+        count += 1
+        if count > _MAX_ELEMENTS:
+            raise VideoProbeError("too many boxes")
+        f.seek(offset)
+        size, box_type = struct.unpack(">I4s", _read_exactly(f, 8))
+        header = 8
+        if size == 1:  # 64-bit size follows the type
+            size = struct.unpack(">Q", _read_exactly(f, 8))[0]
+            header = 16
+        elif size == 0:  # box extends to the end of the file
+            size = end - offset
+        if size < header:
+            raise VideoProbeError(f"invalid size of box {box_type!r}")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _probe_mp4(f: BinaryIO, file_size: int) -> float:
+    for box_type, start, end in _iter_boxes(f, 0, file_size):
+        if box_type != b"moov":
+            continue  # e.g. mdat, which holds the actual media data, is skipped with a single seek
+        mehd_duration = None
+        for child_type, child_start, child_end in _iter_boxes(f, start, end):
+            if child_type == b"mvhd":
+                f.seek(child_start)
+                version = _read_exactly(f, 4)[0]
+                if version == 1:
+                    timescale, duration = struct.unpack(">16xIQ", _read_exactly(f, 28))
+                    unknown = 0xffffffffffffffff
+                else:
+                    timescale, duration = struct.unpack(">8xII", _read_exactly(f, 16))
+                    unknown = 0xffffffff
+                if timescale == 0 or duration == unknown:
+                    raise VideoProbeError("unknown duration in mvhd")
+                if duration:
+                    return duration * 1000 / timescale
+                # fragmented files keep the total duration in mvex/mehd
+                mehd_duration = _probe_mp4_fragments(f, start, end)
+                if mehd_duration:
+                    return mehd_duration * 1000 / timescale
+        raise VideoProbeError("no duration in moov")
+    raise VideoProbeError("no moov box")
+
+
+def _probe_mp4_fragments(f: BinaryIO, start: int, end: int) -> Optional[int]:
+    for box_type, box_start, box_end in _iter_boxes(f, start, end):
+        if box_type == b"mvex":
+            for child_type, child_start, _ in _iter_boxes(f, box_start, box_end):
+                if child_type == b"mehd":
+                    f.seek(child_start)
+                    version = _read_exactly(f, 4)[0]
+                    if version == 1:
+                        return struct.unpack(">Q", _read_exactly(f, 8))[0]
+                    return struct.unpack(">I", _read_exactly(f, 4))[0]
+    return None
+
+
+# Matroska, see https://www.matroska.org/technical/elements.html and RFC 8794 (EBML)
+
+_EBML = 0x1A45DFA3
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMESTAMP_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_CLUSTER = 0x1F43B675
+
+
+def _read_vint(f: BinaryIO, keep_marker: bool) -> Tuple[int, int]:
+    # return (value, length) of an EBML variable size integer, None as value for an unknown size
+    first = _read_exactly(f, 1)[0]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise VideoProbeError("invalid EBML variable size integer")
+    value = first if keep_marker else first & (0xff >> length)
+    rest = _read_exactly(f, length - 1)
+    for byte in rest:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def _iter_elements(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[int, int, Optional[int]]]:
+    # yield (id, data offset, data size) of every element between start and end, which an element of known size
+    # must not go past
+    offset, count = start, 0
+    while offset < end:
+        count += 1
+        if count > _MAX_ELEMENTS:
+            raise VideoProbeError("too many elements")
+        f.seek(offset)
+        element_id, id_length = _read_vint(f, keep_marker=True)
+        size, size_length = _read_vint(f, keep_marker=False)
+        data = offset + id_length + size_length
+        if size is not None and data + size > end:
+            raise VideoProbeError(f"element {element_id:#x} goes past the end of its parent")
+        yield element_id, data, size
+        if size is None:  # unknown size, only allowed for master elements we do not skip
+            return
+        offset = data + size
+
+
+def _probe_mkv(f: BinaryIO, file_size: int) -> float:
+    elements = _iter_elements(f, 0, file_size)
+    element_id, _, _ = next(elements, (None, None, None))
+    if element_id != _EBML:
+        raise VideoProbeError("no EBML header")
+    for element_id, start, size in elements:
+        if element_id != _SEGMENT:
+            continue
+        segment_end = file_size if size is None else start + size
+        for child_id, child_start, child_size in _iter_elements(f, start, segment_end):
+            if child_id == _CLUSTER or child_size is None:
+                break  # media data starts here, the Info element should have come before
+            if child_id != _INFO:
+                continue
+            scale, duration = 1000000, None  # nanoseconds per timestamp tick, default 1 ms
+            for info_id, info_start, info_size in _iter_elements(f, child_start, child_start + child_size):
+                if info_size is None:
+                    raise VideoProbeError("invalid Info element")
+                f.seek(info_start)
+                if info_id == _TIMESTAMP_SCALE:
+                    if not 1 <= info_size <= 8:  # an unsigned integer
+                        raise VideoProbeError("invalid TimestampScale")
+                    scale = int.from_bytes(_read_exactly(f, info_size), 'big')
+                elif info_id == _DURATION and info_size in (4, 8):
+                    duration = struct.unpack(">f" if info_size == 4 else ">d", _read_exactly(f, info_size))[0]
+            if duration is None or duration < 0:
+                raise VideoProbeError("no duration in Info")
+            return duration * scale / 1000000
+        break
+    raise VideoProbeError("no Info element")
+
+
+# FLV, see the Adobe Flash Video File Format Specification version 10.1, annex E
+
+def _skip_amf0_value(data: bytes, offset: int, depth: int = 0) -> int:
+    if depth > 16:
+        raise VideoProbeError("AMF0 data nested too deeply")
+    marker = data[offset]
+    offset += 1
+    if marker == 0x00:  # number
+        return offset + 8
+    if marker == 0x01:  # boolean
+        return offset + 1
+    if marker == 0x02:  # string
+        return offset + 2 + struct.unpack_from(">H", data, offset)[0]
+    if marker == 0x0c:  # long string
+        return offset + 4 + struct.unpack_from(">I", data, offset)[0]
+    if marker in (0x05, 0x06):  # null, undefined
+        return offset
+    if marker == 0x0b:  # date
+        return offset + 10
+    if marker in (0x03, 0x08):  # object, ECMA array
+        if marker == 0x08:
+            offset += 4
+        return _skip_amf0_properties(data, offset, depth)[1]
+    if marker == 0x0a:  # strict array
+        count = struct.unpack_from(">I", data, offset)[0]
+        offset += 4
+        for _ in range(count):
+            offset = _skip_amf0_value(data, offset, depth + 1)
+        return offset
+    raise VideoProbeError(f"unsupported AMF0 type {marker}")
+
+
+def _skip_amf0_properties(data: bytes, offset: int, depth: int = 0,
+                          wanted: Optional[bytes] = None) -> Tuple[Optional[float], int]:
+    # walk the properties of an object until its end marker, return the value of the wanted numeric property
+    found = None
+    while True:
+        key_length = struct.unpack_from(">H", data, offset)[0]
+        key = data[offset + 2:offset + 2 + key_length]
+        offset += 2 + key_length
+        if key_length == 0 and data[offset] == 0x09:  # object end
+            return found, offset + 1
+        if key == wanted and data[offset] == 0x00:
+            found = struct.unpack_from(">d", data, offset + 1)[0]
+        offset = _skip_amf0_value(data, offset, depth + 1)
+
+
+def _probe_flv(f: BinaryIO, file_size: int) -> float:
+    header = _read_exactly(f, 9)
+    if header[:3] != b"FLV":
+        raise VideoProbeError("no FLV header")
+    offset = struct.unpack(">I", header[5:9])[0] + 4  # skip PreviousTagSize0
+    # onMetaData is the first script tag, look at the first few tags only
+    for _ in range(8):
+        if offset + 11 > file_size:
+            break
+        f.seek(offset)
+        tag_header = _read_exactly(f, 11)
+        tag_type = tag_header[0] & 0x1f
+        data_size = int.from_bytes(tag_header[1:4], 'big')
+        if tag_type == 18:
+            data = _read_exactly(f, data_size)
+            try:
+                if data[0] != 0x02 or data[3:3 + struct.unpack_from(">H", data, 1)[0]] != b"onMetaData":
+                    raise VideoProbeError("script tag is not onMetaData")
+                offset = 3 + struct.unpack_from(">H", data, 1)[0]
+                if data[offset] == 0x08:
+                    offset += 5
+                elif data[offset] == 0x03:
+                    offset += 1
+                else:
+                    raise VideoProbeError("invalid onMetaData")
+                duration = _skip_amf0_properties(data, offset, wanted=b"duration")[0]
+            except (IndexError, struct.error):
+                raise VideoProbeError("truncated onMetaData")
+            if duration is None or duration <= 0:
+                raise VideoProbeError("no duration in onMetaData")
+            return duration * 1000
+        offset += 11 + data_size + 4  # tag, data and PreviousTagSize
+    raise VideoProbeError("no onMetaData tag")
+
+
+# AVI, see https://docs.microsoft.com/en-us/windows/win32/directshow/avi-riff-file-reference
+
+def _iter_chunks(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int, Optional[bytes]]]:
+    # yield (fourcc, data offset, data size, list type) of every chunk between start and end
+    offset, count = start, 0
+    while offset + 8 <= end:
+        count += 1
+        if count > _MAX_ELEMENTS:
+            raise VideoProbeError("too many chunks")
+        f.seek(offset)
+        fourcc, size = struct.unpack("<4sI", _read_exactly(f, 8))
+        list_type = _read_exactly(f, 4) if fourcc in (b"LIST", b"RIFF") else None
+        yield fourcc, offset + 8, size, list_type
+        offset += 8 + size + (size & 1)  # chunks are padded to an even size
+
+
+def _probe_avi(f: BinaryIO, file_size: int) -> float:
+    header = _read_exactly(f, 12)
+    if header[:4] != b"RIFF" or header[8:12] != b"AVI ":
+        raise VideoProbeError("no AVI header")
+    avih, video, odml_frames = None, None, None
+    for fourcc, start, size, list_type in _iter_chunks(f, 12, file_size):
+        if fourcc == b"LIST" and list_type == b"hdrl":
+            for child, child_start, child_size, child_list in _iter_chunks(f, start + 4, start + size):
+                f.seek(child_start)
+                if child == b"avih" and child_size >= 20:
+                    # microseconds per frame, ..., total frames of the first RIFF chunk
+                    avih = struct.unpack("<I12xI", _read_exactly(f, 20))
+                elif child == b"LIST" and child_list == b"strl" and video is None:
+                    for strl, strl_start, strl_size, _ in _iter_chunks(f, child_start + 4, child_start + child_size):
+                        if strl == b"strh" and strl_size >= 36:
+                            f.seek(strl_start)
+                            fcc_type, scale, rate, _, length = struct.unpack("<4s16xIIII", _read_exactly(f, 36))
+                            if fcc_type == b"vids" and rate:
+                                video = scale, rate, length
+                            break
+                elif child == b"LIST" and child_list == b"odml":
+                    for odml, odml_start, odml_size, _ in _iter_chunks(f, child_start + 4, child_start + child_size):
+                        if odml == b"dmlh" and odml_size >= 4:
+                            f.seek(odml_start)
+                            # files bigger than 1 GB keep the real number of frames here
+                            odml_frames = struct.unpack("<I", _read_exactly(f, 4))[0]
+            break
+        if fourcc == b"LIST" and list_type == b"movi":
+            break
+    if video:
+        scale, rate, length = video
+        return max(length, odml_frames or 0) * scale * 1000 / rate
+    if avih and avih[0] and avih[1]:
+        return (odml_frames or avih[1]) * avih[0] / 1000
+    raise VideoProbeError("no duration in hdrl")
+
+
+# MP3, see ISO/IEC 11172-3 and 13818-3 section 2.4.2.3 (frame header), http://id3.org/id3v2.4.0-structure (ID3v2)
+# and the Xing (or Info) and VBRI headers that encoders write in the first frame with the number of frames
+
+_MP3_SAMPLE_RATES = (44100, 48000, 32000)  # of MPEG 1, halved for MPEG 2 and quartered for MPEG 2.5
+# bit rates in kbit/s by index, for (MPEG 1, layer) and (MPEG 2 or 2.5, layer)
+_MP3_BIT_RATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SYNC_WINDOW = 8 * 1024  # junk allowed between the tags and the first frame, and room for the one after it
+
+
+def _parse_mp3_frame_header(header: bytes) -> Optional[Tuple[bool, int, int, int, int, bool]]:
+    # (MPEG 1, layer, bit rate in bit/s, sample rate, frame length, mono) or None if header is not a frame header
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version, layer = (header[1] >> 3) & 3, 4 - ((header[1] >> 1) & 3)
+    bit_rate_index, sample_rate_index = header[2] >> 4, (header[2] >> 2) & 3
+    if version == 1 or layer == 4 or bit_rate_index in (0, 15) or sample_rate_index == 3:
+        return None  # reserved values, or free format bit rate that cannot be measured from the header
+    mpeg1 = version == 3
+    bit_rate = _MP3_BIT_RATES[(mpeg1, layer)][bit_rate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[sample_rate_index] >> (0 if mpeg1 else 1 if version == 2 else 2)
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        length = (12 * bit_rate // sample_rate + padding) * 4
+    else:
+        length = (144 if mpeg1 or layer == 2 else 72) * bit_rate // sample_rate + padding
+    return mpeg1, layer, bit_rate, sample_rate, length, header[3] >> 6 == 3
+
+
+def _probe_mp3(f: BinaryIO, file_size: int) -> float:
+    start = 0
+    header = _read_exactly(f, 10)
+    while header[:3] == b"ID3":  # tags before the audio, sometimes more than one
+        size = ((header[6] & 0x7F) << 21) | ((header[7] & 0x7F) << 14) | ((header[8] & 0x7F) << 7) | (header[9] & 0x7F)
+        start += 10 + size + (10 if header[5] & 0x10 else 0)  # with a footer
+        f.seek(start)
+        header = f.read(10)
+    f.seek(start)
+    window = f.read(_MP3_SYNC_WINDOW)
+    offset = window.find(b"\xFF")
+    while offset != -1 and offset + 4 <= len(window):
+        frame = _parse_mp3_frame_header(window[offset:offset + 4])
+        # a frame must be followed by another one, or by the end of the window, not to be a stray 0xFF
+        if frame is not None:
+            following = window[offset + frame[4]:offset + frame[4] + 4]
+            if len(following) < 4 or _parse_mp3_frame_header(following) is not None:
+                break
+        offset = window.find(b"\xFF", offset + 1)
+    else:
+        raise VideoProbeError("no MP3 frame")
+    mpeg1, layer, bit_rate, sample_rate, length, mono = frame
+    samples_per_frame = 384 if layer == 1 else 1152 if mpeg1 or layer == 2 else 576
+    if layer == 3:
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        xing = window[offset + 4 + side_info:offset + 4 + side_info + 12]
+        if xing[:4] in (b"Xing", b"Info") and len(xing) == 12 and struct.unpack(">I", xing[4:8])[0] & 1:
+            frames = struct.unpack(">I", xing[8:12])[0]
+            return frames * samples_per_frame * 1000 / sample_rate
+        vbri = window[offset + 36:offset + 36 + 18]
+        if vbri[:4] == b"VBRI" and len(vbri) == 18:
+            frames = struct.unpack(">I", vbri[14:18])[0]
+            return frames * samples_per_frame * 1000 / sample_rate
+    # constant bit rate: every byte of audio lasts the same
+    end = file_size
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b"TAG":  # ID3v1 tag after the audio
+            end -= 128
+    return max(0, end - start - offset) * 8 * 1000 / bit_rate
+
+
+_probes = {
+    ".mp4": _probe_mp4,
+    ".mov": _probe_mp4,
+    ".m4a": _probe_mp4,
+    ".mp3": _probe_mp3,
+    ".mkv": _probe_mkv,
+    ".flv": _probe_flv,
+    ".avi": _probe_avi,
+}
+
+
+class _CountingFile:
+    # the few file methods the probes use, counting the bytes they read
+    def __init__(self, f: BinaryIO):
+        self.seek = f.seek
+        self._read = f.read
+        self.bytes_read = 0
+
+    def read(self, size: int) -> bytes:
+        data = self._read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def probe_duration(path: str) -> Tuple[float, int]:
+    # return the duration of the video (or audio recording) in milliseconds, as read from the header of its container,
+    # and the number of bytes read to find it
+    probe = _probes.get(os.path.splitext(path)[1].lower())
+    if probe is None:
+        raise VideoProbeError(f"no probe for {path}")
+    with open_file(path) as f:
+        file_size = os.fstat(f.fileno()).st_size
+        counting_file = _CountingFile(f)
+        try:
+            return float(probe(counting_file, file_size)), counting_file.bytes_read
+        except (struct.error, IndexError, ValueError, OverflowError) as e:
+            raise VideoProbeError(f"damaged header: {e!r}")
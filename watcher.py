@@ -0,0 +1,192 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+from sys import platform
+from time import sleep, time
+from typing import Iterator, List, Set
+
+from backend import CancellationToken, apply_changes, scan_files, is_analysed_file
+
+# how often the watcher wakes up to check whether it was cancelled
+WAKE_UP_INTERVAL = 0.5
+# changes that come in quick succession, e.g. while a directory of lectures is being copied, are applied together
+DEBOUNCE = 1.
+POLL_INTERVAL = 5.
+
+# see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+# files are only looked at once they have been closed after writing, not at every write while being copied
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, length of the name that follows
+
+
+class InotifyWatcher:
+    # one inotify watch per directory under the watched paths, Linux only
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = {}  # watch descriptor -> path
+        try:
+            for path in paths:
+                self._add_watches(path)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.EACCES, errno.ENOTDIR):  # already gone or not readable
+                return
+            raise OSError(error, os.strerror(error), path)  # e.g. ENOSPC once fs.inotify.max_user_watches is reached
+        self._watched[wd] = path
+
+    def _add_watches(self, path: str):
+        self._add_watch(path)
+        dirs = [path] if os.path.isdir(path) else []
+        while dirs:
+            try:
+                with os.scandir(dirs.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            self._add_watch(entry.path)
+                            dirs.append(entry.path)
+            except OSError:
+                continue
+
+    def _remove_watches(self, path: str):
+        prefix = os.path.join(path, "")
+        for wd, watched in list(self._watched.items()):
+            if watched == path or watched.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watched[wd]
+
+    def read_changes(self, timeout: float) -> Set[str]:
+        # return the files and directories that changed, waiting at most timeout seconds for the first one
+        changed = set()
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return changed
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:  # some events were lost, look at everything again
+                changed.update(self.paths)
+                continue
+            watched = self._watched.get(wd)
+            if watched is None:
+                continue
+            if mask & IN_IGNORED:  # the watched directory is gone
+                del self._watched[wd]
+                continue
+            path = os.path.join(watched, os.fsdecode(name)) if name else watched
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._remove_watches(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    # files may have been written in it before it was watched, it is looked at as a whole anyway
+                    self._add_watches(path)
+            elif mask & IN_CREATE or (name and not is_analysed_file(path)):
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    # compare the size and modification time of every document and video at regular intervals
+    def __init__(self, paths: List[str], interval: float = POLL_INTERVAL):
+        self.paths = paths
+        self._interval = interval
+        self._snapshot = self._take_snapshot()
+        self._next_poll = time() + self._interval
+
+    def _take_snapshot(self) -> dict:
+        start = time()
+        snapshot = {}
+        for path, _ in scan_files(self.paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        # do not spend more than a tenth of the time walking big trees
+        self._interval = max(self._interval, 10 * (time() - start))
+        return snapshot
+
+    def read_changes(self, timeout: float) -> Set[str]:
+        wait = self._next_poll - time()
+        if wait > timeout:
+            sleep(timeout)
+            return set()
+        sleep(max(0., wait))
+        snapshot = self._take_snapshot()
+        self._next_poll = time() + self._interval
+        changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(paths: List[str]):
+    if platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:  # out of watches, or no inotify in this libc
+            print(f"Falling back to polling to watch {paths}: {e}")
+    return PollingWatcher(paths)
+
+
+def iter_changes(paths: List[str], token: CancellationToken) -> Iterator[Set[str]]:
+    # yield the files and directories under paths that changed, until token is cancelled
+    watcher = create_watcher(paths)
+    try:
+        while not token.cancelled:
+            try:
+                changed = watcher.read_changes(WAKE_UP_INTERVAL)
+                while changed and not token.cancelled:
+                    more = watcher.read_changes(DEBOUNCE)
+                    if not more:
+                        break
+                    changed |= more
+            except OSError as e:  # e.g. out of watches for a new directory
+                print(f"Falling back to polling to watch {paths}: {e}")
+                watcher.close()
+                watcher = PollingWatcher(paths)
+                changed = set(paths)  # changes may have been missed
+            if changed and not token.cancelled:
+                yield changed
+    finally:
+        watcher.close()
+
+
+def watch_analysis(paths: List[str], files: dict, token: CancellationToken) -> Iterator[dict]:
+    # yield the updated result of the analysis of paths every time some of its files change, see apply_changes();
+    # files are those collected by iter_analysis
+    for changed in iter_changes(paths, token):
+        yield apply_changes(files, changed, token)
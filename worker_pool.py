@@ -0,0 +1,192 @@
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from heapq import heappop, heappush
+from itertools import count
+from threading import Lock
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# most items held at once to be ordered by cost while every worker is busy, see largest_first()
+SCHEDULE_WINDOW = 8192
+# items cheaper than this many seconds are grouped in tasks of about this cost, up to MAX_BATCH items each
+MIN_TASK_COST = 0.005
+MAX_BATCH = 64
+
+
+def default_worker_count(use_processes: bool = False) -> int:
+    # threads: same default as ThreadPoolExecutor, since parsing is mostly I/O bound
+    # processes: one per core, since they are only worth it for CPU bound parsing
+    if use_processes:
+        return os.cpu_count() or 1
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class Done:
+    # wrap an item whose result is already known (e.g. from a cache) so that map_unordered yields it as is
+    __slots__ = ('result',)
+
+    def __init__(self, result):
+        self.result = result
+
+
+def map_in_thread(func: Callable, items: Iterable) -> Iterator:
+    # same as WorkerPool.map_unordered, but everything runs in the calling thread, e.g. so that it can be profiled
+    for item in items:
+        yield item.result if isinstance(item, Done) else func(item)
+
+
+def largest_first(items: Iterable, cost: Callable, window: int = SCHEDULE_WINDOW,
+                  min_task_cost: float = MIN_TASK_COST, max_batch: int = MAX_BATCH,
+                  idle: Optional[Callable[[], bool]] = None) -> Iterator:
+    # yield the items grouped in tasks (lists of items) from the most to the least expensive one, as estimated by
+    # cost(item) in seconds, so that the slowest files start first instead of finishing alone at the end;
+    # only window items are held at a time, so the order is exact for up to window items and by cost among the next
+    # window items for more; the cheap items left at the end are grouped so that their tasks cost about
+    # min_task_cost, to spend less time submitting them than parsing them; Done items are yielded right away;
+    # with idle(), whether a worker is waiting for a task, the most expensive item held so far is yielded as soon as
+    # one is, so that parsing starts while items are still coming (e.g. from a walk) instead of after window items
+    heap = []
+    arrival = count()  # breaks ties, so that items are never compared
+    items = iter(items)
+    end = object()
+    item = None
+    while True:
+        while item is not end and len(heap) < window and not (heap and idle is not None and idle()):
+            item = next(items, end)
+            if isinstance(item, Done):
+                yield item
+            elif item is not end:
+                heappush(heap, (-cost(item), next(arrival), item))
+        if not heap:
+            return
+        task_cost, _, first = heappop(heap)
+        task_cost, task = -task_cost, [first]
+        while heap and len(task) < max_batch and task_cost - heap[0][0] <= min_task_cost:
+            item_cost, _, next_item = heappop(heap)
+            task_cost -= item_cost
+            task.append(next_item)
+        yield task
+
+
+def _run_chunk(func: Callable, chunk: List) -> List:
+    # module level so that it can be pickled and sent to a worker process
+    return [func(item) for item in chunk]
+
+
+class WorkerPool:
+    # bounded pool of workers shared by every analysis: work is submitted one file (or one small chunk of files)
+    # at a time, so that idle workers always pick up the next file regardless of the directory it comes from;
+    # with the cost of every item, the most expensive ones are submitted first, see largest_first()
+    def __init__(self, max_workers: Optional[int] = None, use_processes: bool = False, chunk_size: int = 16,
+                 size_aware: bool = True):
+        self.use_processes = use_processes
+        self.max_workers = max_workers or default_worker_count(use_processes)
+        # only used with processes and without costs, to send fewer and bigger messages between processes
+        self.chunk_size = chunk_size
+        # whether costs are used at all, otherwise items are submitted in the order they come
+        self.size_aware = size_aware
+        self._executor = None
+        # running maps per executor: one replaced by configure() is shut down when the last of its maps is done
+        self._maps = {}
+        self._lock = Lock()
+
+    def _acquire_executor(self) -> Executor:
+        # the executor a map submits all its tasks to, until it calls _release_executor()
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    # imported here, threads are the default and these imports slow down the start of the app
+                    from concurrent.futures import ProcessPoolExecutor
+                    from multiprocessing import get_context
+                    # spawn works the same on every platform and in the PyInstaller bundle, as long as
+                    # multiprocessing.freeze_support() is called first thing in main.py
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                         mp_context=get_context("spawn"))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="study_planner_worker")
+            self._maps[self._executor] = self._maps.get(self._executor, 0) + 1
+            return self._executor
+
+    def _release_executor(self, executor: Executor):
+        with self._lock:
+            self._maps[executor] -= 1
+            if self._maps[executor]:
+                return
+            del self._maps[executor]
+            if executor is self._executor:
+                return
+        executor.shutdown(wait=False)
+
+    def configure(self, max_workers: Optional[int] = None, use_processes: Optional[bool] = None,
+                  size_aware: Optional[bool] = None):
+        # running maps keep submitting to the old executor until they are done, new maps use the new one
+        with self._lock:
+            if size_aware is not None:
+                self.size_aware = size_aware
+            if use_processes is not None:
+                self.use_processes = use_processes
+            self.max_workers = max_workers or default_worker_count(self.use_processes)
+            executor, self._executor = self._executor, None
+            if executor is None or executor in self._maps:
+                return
+        executor.shutdown(wait=False)
+
+    def _chunks(self, items: Iterable) -> Iterator:
+        # the items in the order they come, in chunks of chunk_size with processes and one by one with threads
+        chunk_size = self.chunk_size if self.use_processes else 1
+        chunk = []
+        for item in items:
+            if isinstance(item, Done):
+                yield item
+                continue
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def map_unordered(self, func: Callable, items: Iterable, cost: Optional[Callable] = None) -> Iterator:
+        # yield func(item) for every item as soon as it is done, only keeping a bounded number of items
+        # in flight so that memory does not grow with the number of files;
+        # with cost(item), the estimated seconds func(item) takes, expensive items are submitted first
+        executor = self._acquire_executor()
+        max_workers, max_pending = self.max_workers, 2 * self.max_workers
+        pending = set()
+        finished = []  # one entry per task done, appended by the workers as soon as they finish it
+        collected = 0  # tasks whose results were yielded
+        if cost is not None and self.size_aware:
+            # a worker is idle when fewer tasks than workers are left to run
+            tasks = largest_first(items, cost, idle=lambda: len(pending) + collected - len(finished) < max_workers)
+        else:
+            tasks = self._chunks(items)
+        try:
+            for task in tasks:
+                if isinstance(task, Done):
+                    yield task.result
+                    continue
+                future = executor.submit(_run_chunk, func, task)
+                future.add_done_callback(lambda _: finished.append(None))
+                pending.add(future)
+                # the results of the tasks already done are yielded right away, without waiting for the others
+                # unless enough are pending
+                if len(finished) > collected or len(pending) >= max_pending:
+                    done, pending = wait(pending, timeout=None if len(pending) >= max_pending else 0,
+                                         return_when=FIRST_COMPLETED)
+                    collected += len(done)
+                    for future in done:
+                        yield from future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        finally:  # the caller stopped iterating, do not run the remaining work
+            for future in pending:
+                future.cancel()
+            self._release_executor(executor)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
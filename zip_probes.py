@@ -0,0 +1,172 @@
+import os
+import posixpath
+import zipfile
+import zlib
+from math import ceil
+from typing import BinaryIO, Dict, Optional, Tuple
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from file_io import open_file
+
+# count the study material of documents that are zip archives (EPUB books, PPTX and ODP slide decks) from their
+# central directory and the few small XML parts that describe them, without extracting the actual content;
+# every probe returns (value, bytes read) or raises ZipProbeError
+
+# uncompressed bytes of XHTML of a printed page, about 2000 characters of text and their markup
+EPUB_BYTES_PER_PAGE = 4096
+# give up on manifests and tables of contents bigger than this, a book does not need more to describe itself
+_MAX_XML_SIZE = 16 * 1024 * 1024
+
+_CONTAINER = "META-INF/container.xml"
+_CONTAINER_NS = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+_OPF_NS = "{http://www.idpf.org/2007/opf}"
+_NCX_NS = "{http://www.daisy.org/z3986/2005/ncx/}"
+_XHTML_NS = "{http://www.w3.org/1999/xhtml}"
+_EPUB_TYPE = "{http://www.idpf.org/2007/ops}type"
+_NCX_MEDIA_TYPE = "application/x-dtbncx+xml"
+
+_PPTX_CONTENT_TYPES = "[Content_Types].xml"
+_PPTX_SLIDE = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+_CONTENT_TYPES_NS = "{http://schemas.openxmlformats.org/package/2006/content-types}"
+_ODP_PAGE = "{urn:oasis:names:tc:opendocument:xmlns:drawing:1.0}page"
+
+
+class ZipProbeError(Exception):
+    # not a zip archive, or not the documents it should describe
+    pass
+
+
+class _CountingFile:
+    # count the bytes zipfile reads from the file, the other methods are the ones of the file
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __getattr__(self, name: str):
+        return getattr(self._f, name)
+
+
+def _read_xml(archive: zipfile.ZipFile, name: str) -> ElementTree.Element:
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        raise ZipProbeError(f"no {name} in the archive")
+    if info.file_size > _MAX_XML_SIZE:
+        raise ZipProbeError(f"{name} is too big")
+    return ElementTree.fromstring(archive.read(info))
+
+
+def _probe_zip(path: str, probe) -> Tuple[int, int]:
+    with open_file(path) as f:
+        counting_file = _CountingFile(f)
+        try:
+            with zipfile.ZipFile(counting_file) as archive:
+                return probe(archive), counting_file.bytes_read
+        except (zipfile.BadZipFile, zlib.error, ElementTree.ParseError, KeyError, ValueError, EOFError,
+                NotImplementedError, RuntimeError) as e:  # damaged, encrypted or compressed with another method
+            raise ZipProbeError(f"damaged archive: {e!r}")
+
+
+# EPUB, see https://www.w3.org/TR/epub-33/ (OCF container, package document and navigation document)
+
+def _epub_page_list(archive: zipfile.ZipFile, base: str, items: Dict[str, Tuple[str, str, str]],
+                    toc: Optional[str]) -> Optional[int]:
+    # the number of pages of the printed book, if the publisher listed them
+    for href, media_type, properties in items.values():
+        if "nav" in properties.split():
+            nav = _read_xml(archive, posixpath.normpath(posixpath.join(base, href)))
+            for element in nav.iter(f"{_XHTML_NS}nav"):
+                if "page-list" in element.get(_EPUB_TYPE, "").split():
+                    return sum(1 for _ in element.iter(f"{_XHTML_NS}a")) or None
+    ncx = items.get(toc) if toc else next((item for item in items.values() if item[1] == _NCX_MEDIA_TYPE), None)
+    if ncx is not None:
+        page_list = _read_xml(archive, posixpath.normpath(posixpath.join(base, ncx[0]))).find(f"{_NCX_NS}pageList")
+        if page_list is not None:
+            return len(page_list.findall(f"{_NCX_NS}pageTarget")) or None
+    return None
+
+
+def _estimate_epub_pages(archive: zipfile.ZipFile) -> int:
+    rootfile = _read_xml(archive, _CONTAINER).find(f"{_CONTAINER_NS}rootfiles/{_CONTAINER_NS}rootfile")
+    if rootfile is None or not rootfile.get("full-path"):
+        raise ZipProbeError("no package document in the container")
+    opf_path = rootfile.get("full-path")
+    package = _read_xml(archive, opf_path)
+    base = posixpath.dirname(opf_path)
+    # id -> (href, media type, properties)
+    items = {item.get("id"): (unquote(item.get("href", "").split("#")[0]), item.get("media-type", ""),
+                              item.get("properties", ""))
+             for item in package.iter(f"{_OPF_NS}item")}
+    spine = package.find(f"{_OPF_NS}spine")
+    if spine is None:
+        raise ZipProbeError("no spine in the package document")
+    try:
+        pages = _epub_page_list(archive, base, items, spine.get("toc"))
+    except (ZipProbeError, ElementTree.ParseError):  # a missing or damaged table of contents is not needed
+        pages = None
+    if pages is not None:
+        return pages
+    # otherwise every chapter of the reading order starts on a new page and fills as many as its size needs,
+    # as found in the central directory, without decompressing it
+    chapters = [items[itemref.get("idref")][0] for itemref in spine.iter(f"{_OPF_NS}itemref")
+                if itemref.get("idref") in items]
+    pages = 0
+    for chapter in chapters:
+        try:
+            pages += ceil(archive.getinfo(posixpath.normpath(posixpath.join(base, chapter))).file_size
+                          / EPUB_BYTES_PER_PAGE)
+        except KeyError:  # listed but missing
+            continue
+    return pages
+
+
+def estimate_epub_pages(path: str) -> Tuple[int, int]:
+    # return the printed pages of the EPUB book, from its page list or estimated from the size of its chapters,
+    # and the number of bytes read to find them
+    return _probe_zip(path, _estimate_epub_pages)
+
+
+# PPTX, see ECMA-376 part 2 (Open Packaging Conventions), and ODP, see OpenDocument 1.3 part 3 section 9.1.4
+
+def _count_pptx_slides(archive: zipfile.ZipFile) -> int:
+    # every slide is a part of the package, declared in the content types manifest
+    content_types = _read_xml(archive, _PPTX_CONTENT_TYPES)
+    slides = sum(1 for override in content_types.iter(f"{_CONTENT_TYPES_NS}Override")
+                 if override.get("ContentType") == _PPTX_SLIDE)
+    if slides:
+        return slides
+    # content types can also be declared by extension only, then the slides are found by their names
+    names = [name for name in archive.namelist() if name.startswith("ppt/slides/slide") and name.endswith(".xml")]
+    return len(names)
+
+
+def _count_odp_slides(archive: zipfile.ZipFile) -> int:
+    # slides are draw:page elements of the body of content.xml, streamed instead of loaded at once
+    # since it also holds the content of every slide
+    slides = 0
+    with archive.open("content.xml") as content:
+        for _, element in ElementTree.iterparse(content):
+            if element.tag == _ODP_PAGE:
+                slides += 1
+                element.clear()
+    return slides
+
+
+_slide_counters = {
+    ".pptx": _count_pptx_slides,
+    ".odp": _count_odp_slides,
+}
+
+
+def count_slides(path: str) -> Tuple[int, int]:
+    # return the number of slides of the PPTX or ODP presentation and the number of bytes read to count them
+    counter = _slide_counters.get(os.path.splitext(path)[1].lower())
+    if counter is None:
+        raise ZipProbeError(f"no slide counter for {path}")
+    return _probe_zip(path, counter)